@@ -0,0 +1,60 @@
+"""
+Benchmark the accepted regex per CPU-second of the generator
+with the initial parameters and with the auto-tuned parameters
+
+The rate is measured over the last half of the results, once the
+tuner has settled, along with the drift of the output distribution.
+
+Usage:
+    python -m benchmark.auto_tune --records 4000 --seed 0
+"""
+import time
+import argparse
+import itertools
+from src.regex_generator import RegexGenerator
+
+BOUNDS = {
+    'group_complexity': (2, 20),
+    'breadth_complexity': (1, 6),
+    'amount_complexity': (1, 8),
+    'union_complexity': (1, 4),
+    'complex_group_prob': (0.1, 0.9)
+}
+
+
+def measure(generator: RegexGenerator, record_count: int) -> float:
+    """
+    Accepted results per CPU-second over the last half of the results
+    """
+    results = generator.generate()
+    for _ in itertools.islice(results, record_count // 2):
+        pass
+    start = time.process_time()
+    for _ in itertools.islice(results, record_count - record_count // 2):
+        pass
+    return (record_count - record_count // 2) / (time.process_time() - start)
+
+
+def run(record_count: int, seed: int, epoch: int) -> dict:
+    result = {'records': record_count}
+    result['initial_accepted_per_cpu_second'] = measure(RegexGenerator(seed=seed), record_count)
+    generator = RegexGenerator(seed=seed, tune_bounds=BOUNDS, tune_epoch=epoch)
+    result['tuned_accepted_per_cpu_second'] = measure(generator, record_count)
+    stats = generator.tune_stats
+    result['tuned_params'] = stats['params']
+    result['moves'] = stats['moves']
+    for key, value in stats['drift'].items():
+        result[f'drift_{key}'] = value
+    for key in ('mean_complexity', 'mean_length'):
+        result[key] = stats[key]
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--records', type=int, default=4000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--epoch', type=int, default=50)
+    args = parser.parse_args()
+    for key, value in run(args.records, args.seed, args.epoch).items():
+        print(f'{key}: {value}')
@@ -0,0 +1,120 @@
+"""
+Check that the canonical form of a pattern tree matches the same strings
+
+On a fixed-seed corpus of generated pattern trees, the regex and its
+canonical form (`canonicalize`, plain and ordered) are compared on:
+- examples: examples sampled from the tree are fullmatched by the
+    canonical regex
+- reverse: examples of the canonical regex (by exrex) are fullmatched
+    by the regex
+- near misses: the examples with a char inserted, removed or replaced
+    are fullmatched by both regex or by neither
+- enumeration: for the trees of at most `--max-examples` examples that
+    exrex can enumerate, both enumerate the same set of examples
+
+Only the examples fullmatched by their own regex are checked, as exrex
+enumerates an empty string for `\\S` and `\\D`.
+
+The mismatches are printed, and the exit status is 1 if there is any.
+
+Usage:
+    python -m benchmark.canonical --patterns 3000 --seed 0
+"""
+import re
+import sys
+import random
+import string
+import argparse
+import itertools
+import exrex
+from src.random_pattern import PatternGenerator
+from src.canonical import canonicalize
+from src.regex_generator import RegexGenerator
+
+MISS_CHARS = string.ascii_letters + string.digits + string.punctuation + ' \t'
+
+
+def enumerate_by_exrex(regex: str, limit: int):
+    """
+    Up to `limit` examples by exrex, None if exrex cannot enumerate the regex
+    """
+    try:
+        examples = list(itertools.islice(exrex.generate(regex), limit))
+    except TypeError:
+        return None
+    if all(isinstance(x, str) for x in examples):
+        return examples
+    return None
+
+
+def get_near_miss(example: str) -> str:
+    i = random.randrange(len(example) + 1)
+    kind = random.randrange(3) if example else 0
+    if kind == 0:
+        return example[:i] + random.choice(MISS_CHARS) + example[i:]
+    i = min(i, len(example) - 1)
+    if kind == 1:
+        return example[:i] + example[i + 1:]
+    return example[:i] + random.choice(MISS_CHARS) + example[i + 1:]
+
+
+def check_tree(tree, canonical: str, samples: int, max_examples: int) -> dict:
+    """
+    Mismatches of the regex of a tree and its canonical form
+    """
+    compiled = re.compile(tree.regex)
+    canonical_compiled = re.compile(canonical)
+    # exrex enumerates '' for \S and \D, which their regex does not match
+    examples = [x for x in tree.sample_examples(samples) if compiled.fullmatch(x)]
+    mismatches = {
+        'examples': not all(canonical_compiled.fullmatch(x) for x in examples),
+        'reverse': False,
+        'near_misses': any(
+            (compiled.fullmatch(x) is None) != (canonical_compiled.fullmatch(x) is None)
+            for x in map(get_near_miss, examples)),
+        'enumeration': False
+    }
+    canonical_examples = enumerate_by_exrex(canonical, max_examples + 1)
+    if canonical_examples is not None:
+        mismatches['reverse'] = not all(
+            compiled.fullmatch(x) for x in canonical_examples[:samples] if canonical_compiled.fullmatch(x))
+        if tree.count <= max_examples and len(canonical_examples) <= max_examples:
+            mismatches['enumeration'] = set(tree.examples()) != set(canonical_examples)
+    return mismatches
+
+
+def run(pattern_count: int, seed: int, samples: int, max_examples: int) -> dict:
+    random.seed(seed)
+    generator = PatternGenerator(**RegexGenerator().initial_complexities)
+    trees = [generator.get_random_tree_in_window((3, 1000), (1, 20)) for _ in range(pattern_count)]
+    result = {'patterns': pattern_count}
+    for ordered in (False, True):
+        name = 'ordered' if ordered else 'plain'
+        mismatches = {'examples': 0, 'reverse': 0, 'near_misses': 0, 'enumeration': 0}
+        rewritten = 0
+        for tree in trees:
+            canonical = canonicalize(tree, ordered=ordered)
+            rewritten += canonical != tree.regex
+            for key, mismatch in check_tree(tree, canonical, samples, max_examples).items():
+                if mismatch:
+                    mismatches[key] += 1
+                    print(f'{name}.{key}_mismatch: {tree.regex} {canonical}', file=sys.stderr)
+        result[f'{name}.rewritten'] = rewritten
+        for key, count in mismatches.items():
+            result[f'{name}.{key}_mismatches'] = count
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--patterns', type=int, default=3000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--samples', type=int, default=16, help='examples checked of each pattern')
+    parser.add_argument('--max-examples', type=int, default=2000,
+                        help='largest count of the patterns whose examples are enumerated')
+    args = parser.parse_args()
+    result = run(args.patterns, args.seed, args.samples, args.max_examples)
+    for key, value in result.items():
+        print(f'{key}: {value}')
+    if any(value for key, value in result.items() if key.endswith('_mismatches')):
+        sys.exit(1)
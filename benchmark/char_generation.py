@@ -0,0 +1,61 @@
+"""
+Benchmark the batched NumPy draws of the CharGenerator against the per-call draws
+
+Both paths generate the same number of char groups of a fixed length.
+The distributions of the generated chars are compared by the frequency
+of each kind of char node.
+
+Usage:
+    python -m benchmark.char_generation --groups 20000 --length 32 --seed 0
+"""
+import time
+import random
+import argparse
+import collections
+import numpy
+from src.random_pattern import CharGenerator
+from src.regex_generator import RegexGenerator
+
+
+def get_kind(char) -> str:
+    if hasattr(char, 'child'):
+        return f'{type(char).__name__}({type(char.child).__name__})'
+    return type(char).__name__
+
+
+def run(group_count: int, length: int, seed: int) -> dict:
+    complexities = RegexGenerator().initial_complexities
+    result = {'groups': group_count, 'length': length}
+    kinds = {}
+    for name, rng in [('per_call', None), ('batched', numpy.random.default_rng(seed))]:
+        random.seed(seed)
+        generator = CharGenerator(
+            complexities['set_complexity'],
+            complexities['amount_complexity'],
+            special_char_prob=complexities['special_char_prob'],
+            complex_char_prob=complexities['complex_char_prob'],
+            rng=rng
+        )
+        start = time.perf_counter()
+        groups = [generator.get_random_chars(length) for _ in range(group_count)]
+        elapsed = time.perf_counter() - start
+        result[f'{name}_seconds'] = elapsed
+        result[f'{name}_chars_per_second'] = group_count * length / elapsed
+        kinds[name] = collections.Counter(get_kind(char) for chars in groups for char in chars)
+    result['speedup'] = result['per_call_seconds'] / result['batched_seconds']
+    total = group_count * length
+    result['kind_frequency'] = {
+        kind: (kinds['per_call'][kind] / total, kinds['batched'][kind] / total)
+        for kind in sorted(set(kinds['per_call']) | set(kinds['batched']))
+    }
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--groups', type=int, default=20000)
+    parser.add_argument('--length', type=int, default=32)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    for key, value in run(args.groups, args.length, args.seed).items():
+        print(f'{key}: {value}')
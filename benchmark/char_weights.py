@@ -0,0 +1,60 @@
+"""
+Benchmark the weighted selection of simple chars by the CharGenerator
+
+Simple chars are drawn by the threshold chain without weights and by
+the alias table, both with the default kind weights and with a weight
+for every individual char. The frequency of each kind is reported
+for comparison, as well as the cost of a draw from alias tables
+of increasing sizes.
+
+Usage:
+    python -m benchmark.char_weights --chars 200000 --seed 0
+"""
+import time
+import random
+import argparse
+import collections
+from src.alias_table import AliasTable
+from src.random_pattern import CharGenerator
+
+TABLE_SIZES = (4, 128, 4096, 131072)
+
+KINDS = {'CharNode': 'special/printable', 'RangeNode': 'range', 'SetNode': 'set'}
+
+
+def get_char_weights() -> dict:
+    """
+    A distinct weight for every special char and printable
+    """
+    chars = CharGenerator.special_chars + CharGenerator.printable_escapes
+    return {char.regex: 1. + i % 7 for i, char in enumerate(chars)}
+
+
+def run(char_count: int, seed: int) -> dict:
+    result = {'chars': char_count}
+    for name, char_weights in [('no_weights', None), ('kind_weights', {}),
+                               ('char_weights', get_char_weights())]:
+        random.seed(seed)
+        generator = CharGenerator(2, 4, char_weights=char_weights)
+        start = time.perf_counter()
+        chars = [generator._get_random_simple_char() for _ in range(char_count)]
+        result[f'{name}_chars_per_second'] = char_count / (time.perf_counter() - start)
+        kinds = collections.Counter(KINDS[type(char).__name__] for char in chars)
+        result[f'{name}_kind_frequency'] = {
+            kind: count / char_count for kind, count in sorted(kinds.items())}
+    for size in TABLE_SIZES:
+        table = AliasTable([random.random() for _ in range(size)])
+        start = time.perf_counter()
+        for _ in range(char_count):
+            table.sample()
+        result[f'alias_draws_per_second[{size}]'] = char_count / (time.perf_counter() - start)
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--chars', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    for key, value in run(args.chars, args.seed).items():
+        print(f'{key}: {value}')
@@ -0,0 +1,48 @@
+"""
+Benchmark the throughput and backpressure of the CorpusWriter
+
+A fixed sample of generated results is written over and over as fast as
+possible, so that the generation thread is only limited by the writer.
+
+Usage:
+    python -m benchmark.corpus_writer --records 200000 --seed 0
+"""
+import time
+import tempfile
+import argparse
+import itertools
+from src.regex_generator import RegexGenerator
+from src.corpus_writer import CorpusWriter
+
+
+def run(record_count: int, seed: int, batch_size: int, queue_size: int) -> dict:
+    sample = list(itertools.islice(RegexGenerator(seed=seed).generate(), 1000))
+    result = {'records': record_count}
+    for compress in (False, True):
+        with tempfile.TemporaryDirectory() as directory:
+            writer = CorpusWriter(directory, shard_bytes=16 * 2 ** 20, batch_size=batch_size,
+                                  compress=compress, queue_size=queue_size)
+            start = time.perf_counter()
+            with writer:
+                for gen in itertools.islice(itertools.cycle(sample), record_count):
+                    writer.write(gen)
+            elapsed = time.perf_counter() - start
+        name = 'gzip' if compress else 'plain'
+        stats = writer.stats
+        result[f'{name}_records_per_second'] = record_count / elapsed
+        result[f'{name}_mb_per_second'] = stats['raw_bytes'] / elapsed / 2 ** 20
+        result[f'{name}_compression_ratio'] = stats['compression_ratio']
+        result[f'{name}_shards'] = stats['shards']
+        result[f'{name}_blocked_fraction'] = stats['blocked_seconds'] / elapsed
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--records', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--batch-size', type=int, default=1024)
+    parser.add_argument('--queue-size', type=int, default=8)
+    args = parser.parse_args()
+    for key, value in run(args.records, args.seed, args.batch_size, args.queue_size).items():
+        print(f'{key}: {value}')
@@ -0,0 +1,83 @@
+"""
+Benchmark the example enumeration of the pattern tree against exrex
+
+Both enumerators run over the same fixed-seed corpus of generated
+patterns. Timings are compared on the patterns both of them support,
+where the enumerated examples are also checked to be identical.
+
+Usage:
+    python -m benchmark.example_enumeration --patterns 2000 --seed 0
+"""
+import time
+import random
+import argparse
+import exrex
+from src.random_pattern import PatternGenerator
+from src.regex_generator import RegexGenerator
+
+
+def build_corpus(pattern_count: int, seed: int, max_complexity: int, max_length: int) -> list:
+    """
+    Generate the pattern trees to be enumerated
+    """
+    random.seed(seed)
+    generator = PatternGenerator(**RegexGenerator().initial_complexities)
+    return [
+        generator.get_random_tree_in_window((3, max_complexity), (1, max_length))
+        for _ in range(pattern_count)
+    ]
+
+
+def enumerate_by_exrex(regex: str):
+    """
+    Enumerate the examples by exrex, None if exrex cannot enumerate the regex
+    """
+    try:
+        examples = list(exrex.generate(regex))
+    except TypeError:
+        return None
+    if all(isinstance(x, str) for x in examples):
+        return examples
+    return None
+
+
+def run(pattern_count: int, seed: int, max_complexity: int, max_length: int) -> dict:
+    corpus = build_corpus(pattern_count, seed, max_complexity, max_length)
+    native_time = 0.
+    exrex_time = 0.
+    supported = 0
+    mismatches = 0
+    examples = 0
+    for tree in corpus:
+        start = time.perf_counter()
+        reference = enumerate_by_exrex(tree.regex)
+        elapsed = time.perf_counter() - start
+        if reference is None:
+            continue
+        start = time.perf_counter()
+        native = list(tree.examples())
+        native_time += time.perf_counter() - start
+        exrex_time += elapsed
+        supported += 1
+        examples += len(native)
+        mismatches += native != reference
+    return {
+        'patterns': pattern_count,
+        'supported_by_exrex': supported,
+        'mismatches': mismatches,
+        'examples': examples,
+        'exrex_seconds': exrex_time,
+        'native_seconds': native_time,
+        'speedup': exrex_time / native_time if native_time else None
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--patterns', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-complexity', type=int, default=1000)
+    parser.add_argument('--max-length', type=int, default=20)
+    args = parser.parse_args()
+    for key, value in run(args.patterns, args.seed, args.max_complexity, args.max_length).items():
+        print(f'{key}: {value}')
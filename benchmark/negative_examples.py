@@ -0,0 +1,94 @@
+"""
+Benchmark near-miss negative examples mutated from the positive examples
+against rejection sampling of random strings of the same lengths
+
+Besides the throughput, the nearness of the negative examples is the
+mean edit distance of each of them to the closest positive example:
+mutants are one edit away, but for amount boundaries, and random strings
+are about as far as their length.
+
+Usage:
+    python -m benchmark.negative_examples --regex 500 --count 8 --seed 0
+"""
+import time
+import random
+import string
+import argparse
+import itertools
+from src.regex_generator import RegexGenerator
+from src.negative_examples import NegativeExampleGenerator
+
+
+def sample_rejection(result: dict, count: int, max_candidates: int) -> list:
+    """
+    Random printable strings as long as random examples,
+    kept if the regex does not fullmatch them
+    """
+    fullmatch = result['compiled'].fullmatch
+    negatives = {}
+    for _ in range(max_candidates):
+        length = len(random.choice(result['examples']))
+        candidate = ''.join(random.choices(string.printable, k=length))
+        if candidate not in negatives and fullmatch(candidate) is None:
+            negatives[candidate] = None
+            if len(negatives) == count:
+                break
+    return list(negatives)
+
+
+def get_edit_distance(a: str, b: str) -> int:
+    """
+    Levenshtein distance of two strings
+    """
+    previous = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        current = [i]
+        for j, y in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (x != y)))
+        previous = current
+    return previous[-1]
+
+
+def get_mean_distance(results: list, negatives: list) -> float:
+    """
+    Mean edit distance of the negative examples to their closest example
+    """
+    distances = [
+        min(get_edit_distance(negative, example) for example in x['examples'])
+        for x, y in zip(results, negatives)
+        for negative in y
+    ]
+    return sum(distances) / len(distances) if distances else None
+
+
+def run(regex_count: int, count: int, seed: int) -> dict:
+    results = list(itertools.islice(RegexGenerator(seed=seed).generate(), regex_count))
+    random.seed(seed)
+    generator = NegativeExampleGenerator(count)
+    start = time.perf_counter()
+    mutated = [generator.generate(x['tree'], x['compiled'], x['examples']) for x in results]
+    mutation_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    sampled = [sample_rejection(x, count, 8 * count) for x in results]
+    rejection_seconds = time.perf_counter() - start
+    mutated_count = sum(map(len, mutated))
+    sampled_count = sum(map(len, sampled))
+    return {
+        'regex': regex_count,
+        'mutation_negatives_per_regex': mutated_count / regex_count,
+        'mutation_negatives_per_second': mutated_count / mutation_seconds,
+        'mutation_mean_edit_distance': get_mean_distance(results, mutated),
+        'rejection_negatives_per_regex': sampled_count / regex_count,
+        'rejection_negatives_per_second': sampled_count / rejection_seconds,
+        'rejection_mean_edit_distance': get_mean_distance(results, sampled)
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--regex', type=int, default=500)
+    parser.add_argument('--count', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    for key, value in run(args.regex, args.count, args.seed).items():
+        print(f'{key}: {value}')
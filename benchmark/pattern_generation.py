@@ -0,0 +1,160 @@
+"""
+Benchmark the throughput of the PatternGenerator
+
+Patterns are drawn with a fixed seed both without bounds (`get_random_tree`)
+and within a complexity/length window (`get_random_tree_in_window`).
+
+With `--check-distribution`, the unbounded patterns are instead compared
+with those of the former candidate-pool selection of `get_random_groups`
+(kept below as `CandidatePoolGenerator`), by a chi-square test of
+homogeneity on each feature of the patterns. Small p-values (e.g., < 0.01)
+would mean that the selection changed the output distribution.
+
+Usage:
+    python -m benchmark.pattern_generation --patterns 20000 --seed 0
+    python -m benchmark.pattern_generation --patterns 20000 --seed 0 --check-distribution
+"""
+import math
+import time
+import random
+import argparse
+import collections
+from src.random_pattern import PatternGenerator, Wrapper
+from src.pattern_tree import ConcatNode, GroupNode, OrNode, AmountNode, OptionalNode
+from src.regex_generator import RegexGenerator
+
+# Bins of fewer patterns (in both samples) are pooled into one
+MIN_BIN_PATTERNS = 10
+
+
+class CandidatePoolGenerator(PatternGenerator):
+    """
+    PatternGenerator selecting the groups from a fully built candidate
+    pool, as `get_random_groups` did before only the selected groups
+    were built (unbounded patterns only)
+    """
+
+    def get_random_groups(self, group_count: int, recurse: int = 0, window=None):
+        assert window is None, 'the candidate pool does not support windows'
+        candidates = []
+        weights = []
+        while len(candidates) < group_count:
+            group = self._get_random_group_pattern(recurse=recurse)
+            candidates.append(group)
+            weights.append(1. - self._complex_group_prob)
+            candidates.append(self._get_random_union_groups(recurse=recurse))
+            candidates.append(GroupNode(Wrapper.wrap_into_limit_amount(group, self._amount_complexity)))
+            candidates.append(GroupNode(OptionalNode(group)))
+            weights.extend([self._complex_group_prob / 3.] * 3)
+        return random.choices(candidates, k=group_count, weights=tuple(weights))
+
+
+def get_features(tree: ConcatNode) -> dict:
+    """
+    Features of a pattern compared between the two selections
+    """
+    kinds = []
+    bases = []
+    for group in tree.children:
+        child = group.child
+        if isinstance(child, OrNode):
+            kinds.append('or')
+            bases.append(group)
+        elif isinstance(child, (AmountNode, OptionalNode)):
+            kinds.append('amount' if isinstance(child, AmountNode) else 'optional')
+            bases.append(child.child)
+        else:
+            kinds.append('plain')
+            bases.append(group)
+    return {
+        'length': tree.length,
+        'groups': len(tree.children),
+        'log2_complexity': int(math.log2(tree.count)) if tree.count else -1,
+        'group_kinds': ','.join(kinds),
+        # Groups built once and used by several kinds
+        'shared_groups': len(bases) - len({id(x) for x in bases})
+    }
+
+
+def get_chi_square(reference: collections.Counter, current: collections.Counter) -> tuple:
+    """
+    Chi-square statistic of homogeneity of two samples of the same size,
+    its degrees of freedom and its p-value (by the Wilson-Hilferty
+    approximation of the chi-square distribution)
+    """
+    bins = []
+    pooled = [0, 0]
+    for key in set(reference) | set(current):
+        a, b = reference[key], current[key]
+        if a + b < MIN_BIN_PATTERNS:
+            pooled[0] += a
+            pooled[1] += b
+        else:
+            bins.append((a, b))
+    if sum(pooled):
+        bins.append(tuple(pooled))
+    dof = len(bins) - 1
+    if dof < 1:
+        return 0., 0, 1.
+    statistic = sum((a - b) ** 2 / (a + b) for a, b in bins)
+    scale = 2. / (9. * dof)
+    z = ((statistic / dof) ** (1. / 3.) - (1. - scale)) / math.sqrt(scale)
+    return statistic, dof, 0.5 * math.erfc(z / math.sqrt(2.))
+
+
+def check_distribution(pattern_count: int, seed: int) -> dict:
+    complexities = RegexGenerator().initial_complexities
+    samples = []
+    for generator in (CandidatePoolGenerator(**complexities), PatternGenerator(**complexities)):
+        random.seed(seed)
+        counters = collections.defaultdict(collections.Counter)
+        for _ in range(pattern_count):
+            for name, value in get_features(generator.get_random_tree()).items():
+                counters[name][value] += 1
+        samples.append(counters)
+    reference, current = samples
+    result = {'patterns': pattern_count}
+    for name in reference:
+        statistic, dof, p_value = get_chi_square(reference[name], current[name])
+        result[f'{name}_chi2'] = statistic
+        result[f'{name}_dof'] = dof
+        result[f'{name}_p_value'] = p_value
+    return result
+
+
+def run(pattern_count: int, seed: int, max_complexity: int, max_length: int) -> dict:
+    generator = PatternGenerator(**RegexGenerator().initial_complexities)
+    random.seed(seed)
+    start = time.perf_counter()
+    for _ in range(pattern_count):
+        generator.get_random_tree()
+    unbounded_time = time.perf_counter() - start
+    random.seed(seed)
+    start = time.perf_counter()
+    for _ in range(pattern_count):
+        generator.get_random_tree_in_window((3, max_complexity), (1, max_length))
+    window_time = time.perf_counter() - start
+    return {
+        'patterns': pattern_count,
+        'unbounded_seconds': unbounded_time,
+        'unbounded_patterns_per_second': pattern_count / unbounded_time,
+        'window_seconds': window_time,
+        'window_patterns_per_second': pattern_count / window_time
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--patterns', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-complexity', type=int, default=1000)
+    parser.add_argument('--max-length', type=int, default=20)
+    parser.add_argument('--check-distribution', action='store_true',
+                        help='compare the output distribution with the former candidate-pool selection')
+    args = parser.parse_args()
+    if args.check_distribution:
+        result = check_distribution(args.patterns, args.seed)
+    else:
+        result = run(args.patterns, args.seed, args.max_complexity, args.max_length)
+    for key, value in result.items():
+        print(f'{key}: {value}')
@@ -0,0 +1,83 @@
+"""
+Check the pattern tree against exrex and regexfactory
+
+On a fixed-seed corpus of generated pattern trees, for each of several
+settings of the PatternGenerator:
+- the count of the tree equals `exrex.count` of its regex
+- the lazily rendered regex equals the regexfactory rendering (`pattern`)
+- the native examples equal `exrex.generate` of the regex, in order,
+    for the trees exrex can enumerate (not those with empty groups)
+    within `--max-examples`, and `unrank` builds the same examples
+
+The mismatches are printed, and the exit status is 1 if there is any.
+
+Usage:
+    python -m benchmark.pattern_tree --patterns 3000 --seed 0
+"""
+import sys
+import random
+import argparse
+import exrex
+from src.random_pattern import PatternGenerator
+from src.pattern_tree import has_empty_group
+from src.regex_generator import RegexGenerator
+
+# Settings of the PatternGenerator over RegexGenerator.initial_complexities
+SETTINGS = {
+    'default': {},
+    'deep': {'depth_complexity': 1, 'breadth_complexity': 2, 'union_complexity': 3},
+    'sets': {'set_complexity': 4, 'amount_complexity': 6, 'complex_char_prob': 0.8}
+}
+
+
+def check_tree(tree, max_examples: int) -> dict:
+    """
+    Mismatches of a tree, by the property checked
+    """
+    regex = tree.regex
+    mismatches = {
+        'count': tree.count != exrex.count(regex),
+        'regex': regex != tree.pattern.regex,
+        'examples': False,
+        'unrank': False
+    }
+    if tree.count <= max_examples and not has_empty_group(tree):
+        reference = list(exrex.generate(regex))
+        mismatches['examples'] = list(tree.examples()) != reference
+        mismatches['unrank'] = [tree.unrank(i) for i in range(tree.count)] != reference
+    return mismatches
+
+
+def run(pattern_count: int, seed: int, max_examples: int) -> dict:
+    result = {}
+    for name, setting in SETTINGS.items():
+        random.seed(seed)
+        generator = PatternGenerator(**{**RegexGenerator().initial_complexities, **setting})
+        enumerated = 0
+        mismatches = {'count': 0, 'regex': 0, 'examples': 0, 'unrank': 0}
+        for _ in range(pattern_count):
+            tree = generator.get_random_tree()
+            enumerated += tree.count <= max_examples and not has_empty_group(tree)
+            for key, mismatch in check_tree(tree, max_examples).items():
+                if mismatch:
+                    mismatches[key] += 1
+                    print(f'{name}.{key}_mismatch: {tree.regex}', file=sys.stderr)
+        result[f'{name}.patterns'] = pattern_count
+        result[f'{name}.enumerated'] = enumerated
+        for key, count in mismatches.items():
+            result[f'{name}.{key}_mismatches'] = count
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--patterns', type=int, default=3000, help='patterns of each setting')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-examples', type=int, default=2000,
+                        help='largest count of the patterns whose examples are enumerated')
+    args = parser.parse_args()
+    result = run(args.patterns, args.seed, args.max_examples)
+    for key, value in result.items():
+        print(f'{key}: {value}')
+    if any(value for key, value in result.items() if key.endswith('_mismatches')):
+        sys.exit(1)
@@ -0,0 +1,123 @@
+"""
+Benchmark regex engines on a fixed-seed corpus of generated regex
+
+Each engine compiles every regex of the corpus, and fullmatches it
+against its examples (hits) and its near-miss negative examples (misses).
+The times are reported by complexity bucket (powers of 2 of the number
+of examples), along with the matches on which an engine disagrees with
+the corpus, and saved as JSON to compare the engines on evidence.
+
+Engines: `re`, `re` with re.ASCII, and the third-party `regex` module
+(VERSION0, compatible with `re`) if it is installed.
+
+Usage:
+    python -m benchmark.regex_engines --regex 1000 --seed 0 --output engines.json
+"""
+import re
+import json
+import math
+import time
+import argparse
+import itertools
+import statistics
+from src.regex_generator import RegexGenerator
+
+try:
+    import regex
+except ImportError:
+    regex = None
+
+
+def get_engines() -> dict:
+    """
+    Compile function and cache purge of each installed engine
+    """
+    engines = {
+        're': (re.compile, re.purge),
+        're_ascii': (lambda x: re.compile(x, re.ASCII), re.purge),
+    }
+    if regex is not None:
+        engines['regex'] = (lambda x: regex.compile(x, regex.VERSION0), regex.purge)
+    return engines
+
+
+def time_matches(fullmatch, inputs, repeat: int) -> int:
+    """
+    Least nanoseconds of fullmatching all the inputs over the repeats
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for x in inputs:
+            fullmatch(x)
+        elapsed = time.perf_counter_ns() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(regex_count: int, seed: int, max_examples: int, repeat: int) -> dict:
+    corpus = [
+        {
+            'regex': x['regex'],
+            'complexity': x['complexity'],
+            'examples': x['examples'][:max_examples],
+            'negative_examples': x['negative_examples']
+        }
+        for x in itertools.islice(
+            RegexGenerator(seed=seed, negative_examples=max_examples).generate(), regex_count)
+    ]
+    report = {'regex': regex_count, 'seed': seed, 'engines': {}}
+    for name, (compile_regex, purge) in get_engines().items():
+        buckets = {}
+        for record in corpus:
+            bucket = buckets.setdefault(int(math.log2(record['complexity'])), {
+                'regex': 0, 'compile_ns': [], 'hit_ns': 0, 'hits': 0,
+                'miss_ns': 0, 'misses': 0, 'compile_errors': 0, 'disagreements': 0
+            })
+            bucket['regex'] += 1
+            purge()
+            start = time.perf_counter_ns()
+            try:
+                compiled = compile_regex(record['regex'])
+            except Exception:
+                bucket['compile_errors'] += 1
+                continue
+            bucket['compile_ns'].append(time.perf_counter_ns() - start)
+            fullmatch = compiled.fullmatch
+            bucket['disagreements'] += sum(fullmatch(x) is None for x in record['examples'])
+            bucket['disagreements'] += sum(fullmatch(x) is not None for x in record['negative_examples'])
+            bucket['hit_ns'] += time_matches(fullmatch, record['examples'], repeat)
+            bucket['hits'] += len(record['examples'])
+            bucket['miss_ns'] += time_matches(fullmatch, record['negative_examples'], repeat)
+            bucket['misses'] += len(record['negative_examples'])
+        report['engines'][name] = {
+            f'complexity_{2 ** key}_{2 ** (key + 1) - 1}': {
+                'regex': bucket['regex'],
+                'compile_median_us': statistics.median(bucket['compile_ns']) / 1000
+                if bucket['compile_ns'] else None,
+                'hit_ns_per_match': bucket['hit_ns'] / bucket['hits'] if bucket['hits'] else None,
+                'miss_ns_per_match': bucket['miss_ns'] / bucket['misses'] if bucket['misses'] else None,
+                'compile_errors': bucket['compile_errors'],
+                'disagreements': bucket['disagreements']
+            }
+            for key, bucket in sorted(buckets.items())
+        }
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--regex', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-examples', type=int, default=32,
+                        help='hits and misses per regex')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='JSON file of the report')
+    args = parser.parse_args()
+    result = run(args.regex, args.seed, args.max_examples, args.repeat)
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    for engine, buckets in result['engines'].items():
+        for bucket, stats in buckets.items():
+            print(f'{engine}.{bucket}: {json.dumps(stats)}')
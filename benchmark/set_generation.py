@@ -0,0 +1,44 @@
+"""
+Benchmark the construction of random Set/NotSet patterns by the CharGenerator
+
+Sets are drawn for increasing set complexities (the maximum number of
+members), by both the per-call and the batched NumPy draws.
+
+Usage:
+    python -m benchmark.set_generation --sets 20000 --seed 0
+"""
+import time
+import random
+import argparse
+import numpy
+from src.random_pattern import CharGenerator
+
+SET_COMPLEXITIES = (2, 16, 64, 100)
+
+
+def run(set_count: int, seed: int) -> dict:
+    result = {'sets': set_count}
+    for set_complexity in SET_COMPLEXITIES:
+        random.seed(seed)
+        generator = CharGenerator(set_complexity, 4)
+        start = time.perf_counter()
+        for _ in range(set_count):
+            generator._get_random_set()
+        result[f'per_call_sets_per_second[{set_complexity}]'] = set_count / (time.perf_counter() - start)
+        generator = CharGenerator(set_complexity, 4, rng=numpy.random.default_rng(seed))
+        draws = generator._rng.random((set_count, 2 + set_complexity)).tolist()
+        start = time.perf_counter()
+        for member_draws in draws:
+            count = 1 + int(member_draws[0] * set_complexity)
+            generator._get_batched_non_repeating_chars(member_draws[1:count + 2])
+        result[f'batched_sets_per_second[{set_complexity}]'] = set_count / (time.perf_counter() - start)
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sets', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    for key, value in run(args.sets, args.seed).items():
+        print(f'{key}: {value}')
@@ -0,0 +1,89 @@
+"""
+Benchmark feeding generated results to a consumer process,
+through pickled batches in a multiprocessing queue
+or through the shared batches of a SharedBatchRing
+
+A fixed sample of generated results is fed over and over as fast as
+possible, so that only the transport is measured. The consumer of the
+ring reads the arrays in place, as a training data loader would, or
+decodes the records into dicts.
+
+Usage:
+    python -m benchmark.shared_batches --records 200000 --seed 0
+"""
+import time
+import argparse
+import itertools
+import multiprocessing
+from toolz.itertoolz import partition_all
+from src.regex_generator import RegexGenerator
+from src.corpus_writer import FIELDS
+from src.shared_batches import SharedBatchRing
+
+
+def consume_queue(results, done):
+    records = 0
+    while True:
+        batch = results.get()
+        if batch is None:
+            break
+        records += len(batch)
+    done.put(records)
+
+
+def consume_ring(ring, done, decode):
+    records = 0
+    for batch in ring:
+        if decode:
+            records += sum(1 for _ in batch.records())
+        else:
+            # Touch the arrays as a data loader would
+            records += len(batch)
+            int(batch.complexity.sum()) + int(batch.data.sum())
+    done.put(records)
+    ring.close()
+
+
+def run(record_count: int, seed: int, batch_size: int, full_results: bool) -> dict:
+    sample = list(itertools.islice(RegexGenerator(seed=seed).generate(), 1000))
+    if not full_results:
+        sample = [{key: x[key] for key in FIELDS if key in x} for x in sample]
+    result = {'records': record_count}
+    done = multiprocessing.Queue()
+
+    results = multiprocessing.Queue(maxsize=8)
+    consumer = multiprocessing.Process(target=consume_queue, args=(results, done))
+    consumer.start()
+    start = time.perf_counter()
+    for batch in partition_all(batch_size, itertools.islice(itertools.cycle(sample), record_count)):
+        results.put(list(batch))
+    results.put(None)
+    assert done.get() == record_count
+    result['queue_records_per_second'] = record_count / (time.perf_counter() - start)
+    consumer.join()
+
+    for decode in (False, True):
+        with SharedBatchRing(slots=8, slot_records=batch_size) as ring:
+            consumer = multiprocessing.Process(target=consume_ring, args=(ring, done, decode))
+            consumer.start()
+            start = time.perf_counter()
+            for slot in ring.pack(itertools.islice(itertools.cycle(sample), record_count)):
+                ring.publish(slot)
+            ring.finish()
+            assert done.get() == record_count
+            name = 'ring_decoded' if decode else 'ring'
+            result[f'{name}_records_per_second'] = record_count / (time.perf_counter() - start)
+            consumer.join()
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--records', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--full-results', action='store_true',
+                        help='pickle the whole results (with pattern trees and compiled regex)')
+    args = parser.parse_args()
+    for key, value in run(args.records, args.seed, args.batch_size, args.full_results).items():
+        print(f'{key}: {value}')
@@ -0,0 +1,246 @@
+"""
+Reproducible microbenchmarks of the generator hot paths
+
+Each case runs a hot path with a fixed seed on fixed inputs, built
+before the timing starts. A case can also return a setup along with
+its run, called before each run outside of the timing, for the state
+used up by a run (e.g., a fresh dedupe filter). A run repeats the case for `--min-seconds`
+with the garbage collector disabled (as timeit does), and the best of
+`--repeat` runs is kept. The results can be saved as JSON, and compared
+with the results saved at another commit, flagging the cases that got
+slower than the threshold (with exit status 1, e.g., for CI).
+
+NOTE: runs of the same commit differ by up to about 10% on a busy
+machine, so the default threshold is 15%.
+
+Usage:
+    python -m benchmark.suite --save baseline.json
+    python -m benchmark.suite --compare baseline.json --threshold 0.15
+"""
+import gc
+import sys
+import json
+import time
+import random
+import typing
+import argparse
+import platform
+import itertools
+import subprocess
+import exrex
+from src.random_pattern import CharGenerator, PatternGenerator
+from src.regex_generator import RegexGenerator
+
+# Presets of the end-to-end cases over RegexGenerator.initial_complexities,
+# and the number of results generated by a run
+PRESETS = {
+    'default': ({}, 100),
+    'simple': ({'group_complexity': 4, 'breadth_complexity': 1, 'complex_group_prob': 0.2}, 1000),
+    'complex': ({'set_complexity': 4, 'union_complexity': 3, 'breadth_complexity': 5,
+                 'complex_group_prob': 0.8}, 10)
+}
+
+
+def get_results(seed: int, count: int) -> list:
+    """
+    Accepted results of the generator, with their trees and compiled regex
+    """
+    return list(itertools.islice(RegexGenerator(seed=seed).generate(), count))
+
+
+def case_get_random_chars(seed: int, scale: int):
+    complexities = RegexGenerator().initial_complexities
+    generator = CharGenerator(complexities['set_complexity'], complexities['amount_complexity'])
+
+    def run():
+        for _ in range(2000 * scale):
+            generator.get_random_chars(8)
+        return 2000 * scale
+    return run
+
+
+def case_get_random_pattern(seed: int, scale: int):
+    generator = PatternGenerator(**RegexGenerator().initial_complexities)
+
+    def run():
+        for _ in range(1000 * scale):
+            generator.get_random_pattern()
+        return 1000 * scale
+    return run
+
+
+def case_exrex_count(seed: int, scale: int):
+    regexes = [x['regex'] for x in get_results(seed, 200 * scale)]
+
+    def run():
+        for regex in regexes:
+            exrex.count(regex)
+        return len(regexes)
+    return run
+
+
+def case_add_examples(seed: int, scale: int):
+    generator = RegexGenerator(seed=seed)
+    results = get_results(seed, 200 * scale)
+
+    def run():
+        for x in results:
+            generator._add_examples(dict(x))
+        return len(results)
+    return run
+
+
+def case_examples_fullmatch(seed: int, scale: int):
+    """
+    Fullmatching all the examples of a regex, done by
+    `_all_examples_fullmatch` before it was streamed into `_add_examples`
+    """
+    results = get_results(seed, 200 * scale)
+
+    def run():
+        for x in results:
+            fullmatch = x['compiled'].fullmatch
+            all(fullmatch(example) is not None for example in x['examples'])
+        return len(results)
+    return run
+
+
+def case_filter_repeat(seed: int, scale: int):
+    results = get_results(seed, 200 * scale)
+    # Each result twice, so that half of them are repeats
+    stream = [{'regex': x['regex']} for x in results] * 2
+    generators = []
+
+    def setup():
+        # An empty filter for each run
+        generators.append(RegexGenerator(seed=seed))
+
+    def run():
+        for _ in generators.pop()._filter_repeat(stream):
+            pass
+        return len(stream)
+    return setup, run
+
+
+def get_generate_case(preset: dict, count: int):
+    def case(seed: int, scale: int):
+        def run():
+            generator = RegexGenerator(seed=seed)
+            generator._pattern_generator = generator._get_pattern_generator(
+                {**generator.initial_complexities, **preset})
+            for _ in itertools.islice(generator.generate(), count * scale):
+                pass
+            return count * scale
+        return run
+    return case
+
+
+CASES = {
+    'char_generator.get_random_chars': case_get_random_chars,
+    'pattern_generator.get_random_pattern': case_get_random_pattern,
+    'exrex.count': case_exrex_count,
+    'regex_generator._add_examples': case_add_examples,
+    'regex_generator.examples_fullmatch': case_examples_fullmatch,
+    'regex_generator._filter_repeat': case_filter_repeat,
+    **{f'generate.{name}': get_generate_case(preset, count) for name, (preset, count) in PRESETS.items()}
+}
+
+
+def get_commit() -> typing.Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(timed: typing.Callable[[], int], seed: int, min_seconds: float,
+            setup: typing.Optional[typing.Callable[[], None]] = None) -> typing.Tuple[int, float]:
+    """
+    Items and seconds of repeating a case for at least min_seconds,
+    calling the setup (if any) before each run, outside of the timing
+    """
+    items = 0
+    seconds = 0.
+    gc.collect()
+    gc.disable()
+    try:
+        while seconds < min_seconds:
+            if setup is not None:
+                setup()
+            random.seed(seed)
+            start = time.perf_counter()
+            items += timed()
+            seconds += time.perf_counter() - start
+    finally:
+        gc.enable()
+    return items, seconds
+
+
+def run(seed: int, scale: int, repeat: int, min_seconds: float, cases: list) -> dict:
+    results = {}
+    for name in cases:
+        random.seed(seed)
+        case = CASES[name](seed, scale)
+        setup, timed = case if isinstance(case, tuple) else (None, case)
+        best = None
+        for _ in range(repeat):
+            items, seconds = measure(timed, seed, min_seconds, setup)
+            if best is None or items / seconds > best['items_per_second']:
+                best = {'items': items, 'seconds': seconds, 'items_per_second': items / seconds}
+        results[name] = best
+    return {
+        'commit': get_commit(),
+        'python': platform.python_version(),
+        'seed': seed,
+        'scale': scale,
+        'repeat': repeat,
+        'min_seconds': min_seconds,
+        'results': results
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """
+    Ratio of the rates of the current results to those of the baseline,
+    and the cases slower than the threshold
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        if name not in baseline['results']:
+            continue
+        ratio = result['items_per_second'] / baseline['results'][name]['items_per_second']
+        flag = ''
+        if ratio < 1. - threshold:
+            regressions.append(name)
+            flag = ' REGRESSION'
+        print(f'{name}.ratio: {ratio:.3f}{flag}')
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scale', type=int, default=1, help='multiplier of the items of each case')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--min-seconds', type=float, default=1.0, help='least duration of a run')
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--save', help='JSON file to save the results into')
+    parser.add_argument('--compare', help='JSON file of the baseline results')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='relative slowdown flagged as a regression')
+    args = parser.parse_args()
+    report = run(args.seed, args.scale, args.repeat, args.min_seconds, args.cases)
+    for key, value in report['results'].items():
+        print(f'{key}: {value["items_per_second"]:.1f} items/s')
+    if args.save is not None:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline['seed'] != report['seed'] or baseline['scale'] != report['scale']:
+            print('warning: baseline ran with another seed or scale', file=sys.stderr)
+        print(f'baseline: {baseline["commit"]}')
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
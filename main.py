@@ -1,5 +1,120 @@
+"""
+Write random regex with their complexity, length and examples
+into compressed JSON-lines shards
+
+Usage:
+    python main.py --output corpus
+    python main.py --output corpus --checkpoint corpus.ckpt
+    python main.py --output corpus --checkpoint corpus.ckpt --resume
+    python main.py --output corpus --workers 32
+
+Across nodes, a coordinator writes the records generated by the workers
+from the seeds in [START, STOP), de-duplicated across workers. The
+messages are pickled, so REGEX_AUTHKEY must be a secret shared by the
+coordinator and its workers only:
+    REGEX_AUTHKEY=secret python main.py --output corpus --serve 0.0.0.0:6000 --seeds 0:1024
+    REGEX_AUTHKEY=secret python main.py --connect coordinator-host:6000
+"""
+import os
+import sys
+import json
+import time
+import argparse
 from src.regex_generator import RegexGenerator
+from src.corpus_writer import CorpusWriter
+from src.distributed import Coordinator, run_worker, parse_address
 
 
-for gen in RegexGenerator().generate():
-    print(gen)
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--output', default='corpus', help='directory of the output shards')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--workers', type=int, default=1, help='number of generation processes')
+    parser.add_argument('--shard-bytes', type=int, default=64 * 2 ** 20)
+    parser.add_argument('--batch-size', type=int, default=1024)
+    parser.add_argument('--no-compress', action='store_true')
+    parser.add_argument('--checkpoint', help='file to checkpoint the generator into')
+    parser.add_argument('--checkpoint-interval', type=float, default=300.0)
+    parser.add_argument('--resume', action='store_true',
+                        help='continue from the checkpoint and the output of a previous run')
+    parser.add_argument('--overwrite', action='store_true',
+                        help='delete the output of a previous run that is not resumed')
+    parser.add_argument('--negative-examples', type=int, metavar='N',
+                        help='add up to N near misses not matched by each regex')
+    parser.add_argument('--match-cost', action='store_true',
+                        help='add the cost of matching each regex with re')
+    parser.add_argument('--match-cost-buckets', metavar='LOW:HIGH',
+                        help='keep the regex whose match cost bucket (log2 of microseconds) is in [LOW, HIGH]')
+    parser.add_argument('--serve', metavar='HOST:PORT', help='run the coordinator of the workers')
+    parser.add_argument('--connect', metavar='HOST:PORT', help='run a worker of the coordinator')
+    parser.add_argument('--seeds', default='0:64', metavar='START:STOP',
+                        help='seeds generated from by the workers of the coordinator')
+    parser.add_argument('--range-size', type=int, default=4, help='number of seeds leased at once')
+    parser.add_argument('--records-per-seed', type=int, default=1000)
+    args = parser.parse_args()
+    if args.workers > 1 and args.checkpoint is not None:
+        parser.error('--checkpoint is not supported with --workers > 1')
+    if args.resume and args.checkpoint is None:
+        parser.error('--resume requires --checkpoint')
+    match_cost_buckets = None
+    if args.match_cost_buckets is not None:
+        match_cost_buckets = tuple(int(x) for x in args.match_cost_buckets.split(':'))
+    stage_kwargs = {
+        'negative_examples': args.negative_examples,
+        'match_cost': args.match_cost or match_cost_buckets is not None,
+        'match_cost_buckets': match_cost_buckets
+    }
+    if args.serve is not None or args.connect is not None:
+        if not os.environ.get('REGEX_AUTHKEY'):
+            parser.error('--serve and --connect require a secret key in REGEX_AUTHKEY')
+        authkey = os.environ['REGEX_AUTHKEY'].encode()
+    if args.connect is not None:
+        sent = run_worker(parse_address(args.connect), authkey, RegexGenerator, stage_kwargs)
+        print(json.dumps({'records': sent}), file=sys.stderr)
+        sys.exit(0)
+    if args.serve is not None:
+        start, stop = (int(x) for x in args.seeds.split(':'))
+        try:
+            writer = CorpusWriter(args.output, shard_bytes=args.shard_bytes, batch_size=args.batch_size,
+                                  compress=not args.no_compress, overwrite=args.overwrite)
+        except FileExistsError as e:
+            parser.error(f'{e}; pass --overwrite to delete it')
+        with writer:
+            coordinator = Coordinator(parse_address(args.serve), authkey, writer.write,
+                                      range(start, stop), range_size=args.range_size,
+                                      records_per_seed=args.records_per_seed)
+            coordinator.serve()
+        print(json.dumps({**coordinator.stats, 'writer': writer.stats}), file=sys.stderr)
+        sys.exit(0)
+    generator = RegexGenerator(
+        seed=args.seed,
+        checkpoint_path=args.checkpoint,
+        # Checkpoints are saved below, once the writer is flushed
+        checkpoint_interval=None,
+        resume=args.resume,
+        **stage_kwargs
+    )
+    try:
+        writer = CorpusWriter(
+            args.output,
+            shard_bytes=args.shard_bytes,
+            batch_size=args.batch_size,
+            compress=not args.no_compress,
+            # Only the output of a run resumed from its checkpoint is kept
+            resume_offset=generator.offset if generator.resumed else None,
+            overwrite=args.overwrite
+        )
+    except FileExistsError as e:
+        parser.error(f'{e}; pass --resume with its checkpoint, or --overwrite to delete it')
+    last_save = time.monotonic()
+    try:
+        with writer:
+            for gen in generator.generate(workers=args.workers):
+                writer.write(gen)
+                if args.checkpoint is not None and \
+                        time.monotonic() - last_save >= args.checkpoint_interval:
+                    writer.flush()
+                    generator.save_checkpoint()
+                    last_save = time.monotonic()
+    finally:
+        print(json.dumps(writer.stats), file=sys.stderr)
@@ -0,0 +1,66 @@
+"""
+Constant-time sampling from a discrete distribution
+
+Vose's alias method splits the weights into equal-probability columns,
+each holding at most two outcomes, so that a draw takes one uniform
+number whatever the number of outcomes.
+
+REF:
+Vose, A Linear Algorithm for Generating Random Numbers
+with a Given Distribution (1991)
+"""
+import random
+import typing
+
+__all__ = ['AliasTable']
+
+
+class AliasTable:
+    """
+    Alias table over the indices of the weights
+    """
+
+    def __init__(self, weights: typing.Sequence[float]):
+        assert len(weights) > 0, 'weights should not be empty'
+        assert all(x >= 0 for x in weights), 'weights should be >= 0'
+        total = sum(weights)
+        assert total > 0, 'sum of weights should be > 0'
+        size = len(weights)
+        scaled = [x * size / total for x in weights]
+        self._size = size
+        self._probs = [1.] * size
+        self._aliases = list(range(size))
+        small = [i for i, x in enumerate(scaled) if x < 1.]
+        large = [i for i, x in enumerate(scaled) if x >= 1.]
+        while small and large:
+            i = small.pop()
+            j = large.pop()
+            self._probs[i] = scaled[i]
+            self._aliases[i] = j
+            scaled[j] += scaled[i] - 1.
+            if scaled[j] < 1.:
+                small.append(j)
+            else:
+                large.append(j)
+        # The columns left are full up to rounding errors
+
+    def __len__(self) -> int:
+        return self._size
+
+    def sample(self) -> int:
+        """
+        Draw an index by the `random` module
+        """
+        return self.sample_from(random.random())
+
+    def sample_from(self, draw: float) -> int:
+        """
+        Draw an index from a uniform number in [0, 1):
+        its integer part (scaled by the size) picks the column,
+        and its fractional part picks the outcome in the column.
+        """
+        x = draw * self._size
+        i = min(int(x), self._size - 1)
+        if x - i < self._probs[i]:
+            return i
+        return self._aliases[i]
@@ -0,0 +1,209 @@
+"""
+Adaptive tuning of the complexity parameters of the pattern generator
+
+Whether a setting of the PatternGenerator mostly yields patterns rejected
+by the complexity, length or validity filters depends on `max_complexity`
+and `max_length`, so the tuner searches the setting while generating.
+
+The generation is split into epochs of a fixed number of accepted
+results, each run with one setting. Epochs alternate between the best
+setting so far (the incumbent), whose rate is re-measured as a moving
+average, and a trial setting moving one parameter of the incumbent by one
+step within its bounds. The trial replaces the incumbent if its accepted
+results per CPU-second beat those of the incumbent by `margin`.
+
+As the setting moves, so does the distribution of the generated regex,
+so the tuner keeps histograms of the complexity (by powers of 2) and the
+length of the results generated by the initial setting, by the incumbent
+and overall, and reports their total variation distances.
+"""
+import copy
+import math
+import random
+import typing
+import collections
+
+__all__ = ['AutoTuner']
+
+
+class AutoTuner:
+    """
+    Hill climbing of the PatternGenerator parameters
+    on accepted results per CPU-second
+
+    Args:
+        - initial: initial parameters (see `RegexGenerator.initial_complexities`)
+        - bounds: (lower, upper) bounds of the tuned parameters, both included.
+            Integer parameters move by steps of 1/8 of their range (at least 1),
+            and float parameters by 1/8 of their range.
+        - epoch_accepted: number of accepted results of an epoch
+        - margin: relative improvement for a trial setting to replace the incumbent
+        - seed: seed of the choice of the trial settings
+    """
+
+    def __init__(self, initial: dict, bounds: typing.Dict[str, typing.Tuple[float, float]],
+                 epoch_accepted: int = 50, margin: float = 0.05, seed: typing.Optional[int] = None):
+        assert len(bounds) > 0, 'bounds should not be empty'
+        assert isinstance(epoch_accepted, int) and epoch_accepted > 0, 'epoch_accepted should be > 0'
+        assert isinstance(margin, float) and margin >= 0.0, 'margin should be a float >= 0'
+        self._steps = {}
+        self._bounds = {}
+        for name, (lower, upper) in bounds.items():
+            assert name in initial, f'unknown parameter: {name}'
+            assert lower <= initial[name] <= upper, f'initial {name} should be in its bounds'
+            if isinstance(initial[name], int):
+                assert isinstance(lower, int) and isinstance(upper, int), f'bounds of {name} should be int'
+                self._steps[name] = max(1, (upper - lower) // 8)
+            else:
+                # Clamped values should stay floats, e.g., with (0.2, 1)
+                lower, upper = float(lower), float(upper)
+                self._steps[name] = (upper - lower) / 8
+            self._bounds[name] = (lower, upper)
+        self._epoch_accepted = epoch_accepted
+        self._margin = margin
+        self._random = random.Random(seed)
+        self._initial = dict(initial)
+        self._incumbent = dict(initial)
+        self._incumbent_rate: typing.Optional[float] = None
+        self._initial_rate: typing.Optional[float] = None
+        self._trial: typing.Optional[dict] = None
+        self._epochs = 0
+        self._trials = 0
+        self._moves = 0
+        self._accepted = 0
+        self._candidates = 0
+        self._cpu_seconds = 0.
+        self._epoch = [0, 0, 0.]
+        self._histograms = {key: _get_histogram() for key in ('initial', 'incumbent', 'trial', 'overall')}
+
+    @property
+    def params(self) -> dict:
+        """
+        Parameters of the running epoch
+        """
+        return dict(self._incumbent if self._trial is None else self._trial)
+
+    def copy(self) -> 'AutoTuner':
+        return copy.deepcopy(self)
+
+    def record(self, result: dict, candidates: int, cpu_seconds: float) -> typing.Optional[dict]:
+        """
+        Record an accepted result, the number of candidate patterns and
+        the CPU time it took, and return the parameters of the next epoch
+        if the generator should switch to them
+        """
+        self._epoch[0] += 1
+        self._epoch[1] += candidates
+        self._epoch[2] += cpu_seconds
+        self._accepted += 1
+        self._candidates += candidates
+        self._cpu_seconds += cpu_seconds
+        self._add_to_histograms(result)
+        if self._epoch[0] < self._epoch_accepted:
+            return None
+        accepted, _, seconds = self._epoch
+        rate = accepted / seconds if seconds else math.inf
+        self._epoch = [0, 0, 0.]
+        self._epochs += 1
+        if self._trial is None:
+            if self._incumbent_rate is None:
+                self._incumbent_rate = rate
+            else:
+                self._incumbent_rate = (self._incumbent_rate + rate) / 2
+            if self._initial_rate is None:
+                self._initial_rate = rate
+            self._trial = self._get_trial()
+            self._trials += 1
+            return self.params
+        if rate > self._incumbent_rate * (1. + self._margin):
+            self._incumbent = self._trial
+            self._incumbent_rate = rate
+            self._histograms['incumbent'] = self._histograms['trial']
+            self._moves += 1
+        self._histograms['trial'] = _get_histogram()
+        switch = self._trial != self._incumbent
+        self._trial = None
+        return self.params if switch else None
+
+    @property
+    def report(self) -> dict:
+        """
+        Incumbent parameters, throughput, and distance of
+        the output distribution from that of the initial parameters
+        """
+        histograms = self._histograms
+        return {
+            'params': {name: self._incumbent[name] for name in self._bounds},
+            'initial_params': {name: self._initial[name] for name in self._bounds},
+            'epochs': self._epochs,
+            'trials': self._trials,
+            'moves': self._moves,
+            'accepted_per_cpu_second': self._incumbent_rate,
+            'initial_accepted_per_cpu_second': self._initial_rate,
+            'acceptance_rate': self._accepted / self._candidates if self._candidates else None,
+            'cpu_seconds_per_candidate': self._cpu_seconds / self._candidates if self._candidates else None,
+            'drift': {
+                f'{field}_{key}': _get_total_variation(histograms['initial'][field], histograms[key][field])
+                for key in ('incumbent', 'overall') for field in ('complexity', 'length')
+            },
+            'mean_complexity': {
+                key: histograms[key]['complexity_sum'] / histograms[key]['count']
+                if histograms[key]['count'] else None
+                for key in ('initial', 'incumbent', 'overall')
+            },
+            'mean_length': {
+                key: histograms[key]['length_sum'] / histograms[key]['count']
+                if histograms[key]['count'] else None
+                for key in ('initial', 'incumbent', 'overall')
+            }
+        }
+
+    def _get_trial(self) -> dict:
+        """
+        Move one parameter of the incumbent by one step within its bounds
+        """
+        names = list(self._bounds)
+        while True:
+            name = self._random.choice(names)
+            lower, upper = self._bounds[name]
+            value = self._incumbent[name] + self._random.choice((-1, 1)) * self._steps[name]
+            value = min(max(value, lower), upper)
+            if isinstance(value, float):
+                value = round(value, 9)
+            if value != self._incumbent[name] or all(
+                    self._bounds[x][0] == self._bounds[x][1] for x in names):
+                return {**self._incumbent, name: value}
+
+    def _add_to_histograms(self, result: dict):
+        keys = ['overall', 'incumbent' if self._trial is None else 'trial']
+        if self._moves == 0 and self._trial is None:
+            keys.append('initial')
+        for key in keys:
+            # Complexity by powers of 2, e.g., bin 3 is [8, 16)
+            self._histograms[key]['complexity'][int(math.log2(result['complexity']))] += 1
+            self._histograms[key]['length'][result['length']] += 1
+            self._histograms[key]['complexity_sum'] += result['complexity']
+            self._histograms[key]['length_sum'] += result['length']
+            self._histograms[key]['count'] += 1
+
+
+def _get_histogram() -> dict:
+    return {
+        'complexity': collections.Counter(),
+        'length': collections.Counter(),
+        'complexity_sum': 0,
+        'length_sum': 0,
+        'count': 0
+    }
+
+
+def _get_total_variation(p: collections.Counter, q: collections.Counter) -> typing.Optional[float]:
+    """
+    Total variation distance between two histograms, in [0, 1]
+    """
+    p_total = sum(p.values())
+    q_total = sum(q.values())
+    if not p_total or not q_total:
+        return None
+    return sum(abs(p[x] / p_total - q[x] / q_total) for x in p.keys() | q.keys()) / 2
+
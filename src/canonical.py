@@ -0,0 +1,126 @@
+"""
+Structural canonical form of generated pattern trees
+
+Different trees of the PatternGenerator often match the same strings,
+e.g., `((a))` and `(a)`, `a{1}` and `a`, `(?:a){0,1}` and `(?:a)?`,
+or alternatives in another order. The canonical form is a regex matching
+the same strings as the tree, in which such variants are rendered alike,
+so that the repeats can be dropped before enumerating their examples.
+
+Rules:
+- nested groups, and groups holding only a group, are collapsed
+- an Or of a single alternative is its alternative, and the
+    alternatives of an Or are de-duplicated and sorted
+- x{1} and x{1,1} are x, x{i,i} is x{i}, x{0} and x{0,0} are empty,
+    and x{0,1} is (?:x)?
+- the members of a set are de-duplicated and sorted, and a set of a
+    single special char or printable is that char
+- a range of a single char is that char
+
+With `ordered=True`, the alternatives of an Or and the members of a set
+keep their order (and the repeated alternatives of an Or are kept), so
+that the trees of the same ordered canonical form also enumerate the
+same examples in the same order (see `src.example_cache`).
+"""
+import re
+import typing
+from src.pattern_tree import (
+    PatternNode,
+    CharNode,
+    RangeNode,
+    SetNode,
+    ConcatNode,
+    GroupNode,
+    OrNode,
+    AmountNode,
+    OptionalNode
+)
+
+__all__ = ['canonicalize']
+
+
+def canonicalize(node: PatternNode, ordered: bool = False) -> str:
+    """
+    Canonical regex of a pattern tree
+    """
+    parts = []
+    _render(node, parts, ordered)
+    return ''.join(parts)
+
+
+def _render(node: PatternNode, parts: typing.List[str], ordered: bool):
+    """
+    Append the pieces of the canonical regex to parts
+    """
+    if isinstance(node, RangeNode):
+        if node.start == node.stop:
+            parts.append(re.escape(node.start))
+        else:
+            parts.append(node.regex)
+    elif isinstance(node, SetNode):
+        members = list(dict.fromkeys(char.regex for char in node.chars))
+        if not ordered:
+            members.sort()
+        if len(members) == 1 and not node.negate:
+            parts.append(members[0])
+        else:
+            parts.append(('[^' if node.negate else '[') + ''.join(members) + ']')
+    elif isinstance(node, CharNode):
+        parts.append(node.regex)
+    elif isinstance(node, ConcatNode):
+        for child in node.children:
+            _render(child, parts, ordered)
+    elif isinstance(node, GroupNode):
+        child = _get_group_content(node)
+        if isinstance(child, OrNode) and len(child.children) == 1:
+            child = _get_group_content(child.children[0])
+        parts.append('(')
+        _render(child, parts, ordered)
+        parts.append(')')
+    elif isinstance(node, OrNode):
+        alternatives = [canonicalize(child, ordered) for child in node.children]
+        if not ordered:
+            alternatives = sorted(set(alternatives))
+        if len(alternatives) == 1:
+            parts.append(alternatives[0])
+        else:
+            parts.append('|'.join(f'(?:{x})' for x in alternatives))
+    elif isinstance(node, AmountNode):
+        upper = node.lower if node.upper is None else node.upper
+        if upper == 0:
+            return
+        if node.lower == 1 and upper == 1:
+            _render(node.child, parts, ordered)
+        elif node.lower == 0 and upper == 1:
+            _render_optional(node.child, parts, ordered)
+        else:
+            _render(node.child, parts, ordered)
+            if node.lower == upper:
+                parts.append(f'{{{node.lower}}}')
+            else:
+                parts.append(f'{{{node.lower},{upper}}}')
+    elif isinstance(node, OptionalNode):
+        _render_optional(node.child, parts, ordered)
+    else:
+        raise TypeError(f'unknown pattern node: {node!r}')
+
+
+def _render_optional(child: PatternNode, parts: typing.List[str], ordered: bool):
+    parts.append('(?:')
+    _render(child, parts, ordered)
+    parts.append(')?')
+
+
+def _get_group_content(node: PatternNode) -> PatternNode:
+    """
+    Content of the innermost of the groups nested in a group,
+    seeing through concatenations of a single pattern
+    """
+    while True:
+        if isinstance(node, GroupNode):
+            node = node.child
+        elif isinstance(node, ConcatNode) and len(node.children) == 1 \
+                and isinstance(node.children[0], GroupNode):
+            node = node.children[0]
+        else:
+            return node
@@ -0,0 +1,79 @@
+"""
+Atomic checkpoints of long-running generation jobs
+
+The state is snapshotted by the caller in the generation thread, then
+pickled and written by a background thread, so that the pipeline only
+pauses for the snapshot. A checkpoint is first written to a temporary
+file, synced, and moved over the previous checkpoint, so a job killed
+while writing leaves the previous checkpoint intact.
+"""
+import os
+import pickle
+import typing
+import threading
+
+__all__ = ['Checkpointer']
+
+
+class Checkpointer:
+    """
+    Writer and reader of the checkpoint at `path`
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._thread: typing.Optional[threading.Thread] = None
+        self._error: typing.Optional[BaseException] = None
+        self._saves = 0
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def saves(self) -> int:
+        """
+        Number of checkpoints written
+        """
+        return self._saves
+
+    def exists(self) -> bool:
+        return os.path.exists(self._path)
+
+    def load(self) -> dict:
+        with open(self._path, 'rb') as f:
+            return pickle.load(f)
+
+    def save(self, state: dict):
+        """
+        Write a snapshot of the state in the background, after the
+        previous checkpoint is written. The state should not be changed
+        by the caller afterwards.
+        """
+        self.wait()
+        self._thread = threading.Thread(target=self._write, args=(state,), daemon=True)
+        self._thread.start()
+
+    def wait(self):
+        """
+        Block until the pending checkpoint is written,
+        raising the error of writing it if any
+        """
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _write(self, state: dict):
+        tmp_path = f'{self._path}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self._path)
+            self._saves += 1
+        except BaseException as e:
+            self._error = e
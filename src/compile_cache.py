@@ -0,0 +1,67 @@
+"""
+Bounded cache of compiled regex
+
+The built-in cache of `re` holds only 512 patterns, which a stream of
+distinct random regex keeps evicting. This cache is sized separately
+and counts its hits and misses.
+"""
+import re
+import typing
+from collections import OrderedDict
+
+__all__ = ['CompileCache']
+
+
+class CompileCache:
+    """
+    LRU cache mapping regex strings to compiled patterns
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        assert isinstance(maxsize, int) and maxsize > 0, 'maxsize should be > 0'
+        self._maxsize = maxsize
+        self._patterns: typing.OrderedDict[str, re.Pattern] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def compile(self, regex: str) -> re.Pattern:
+        """
+        Get the compiled pattern of a regex, compiling it on a miss
+        """
+        try:
+            pattern = self._patterns[regex]
+        except KeyError:
+            self._misses += 1
+            pattern = re.compile(regex)
+            self._patterns[regex] = pattern
+            if len(self._patterns) > self._maxsize:
+                self._patterns.popitem(last=False)
+            return pattern
+        self._hits += 1
+        self._patterns.move_to_end(regex)
+        return pattern
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    @property
+    def stats(self) -> dict:
+        """
+        Hit/miss counters of the cache
+        """
+        total = self._hits + self._misses
+        return {
+            'hits': self._hits,
+            'misses': self._misses,
+            'hit_rate': self._hits / total if total else 0.0,
+            'size': len(self._patterns),
+            'maxsize': self._maxsize
+        }
@@ -0,0 +1,244 @@
+"""
+Buffered writer of generated regex into compressed JSON-lines shards
+
+Results are batched in the generation thread, while the serialization,
+compression and disk writes run on a background thread. The queue of
+pending batches is bounded, so the generation thread only waits when
+the disk cannot keep up; the time spent waiting is reported as
+backpressure in `stats`.
+
+Shards are rotated by size and listed in `manifest.json` together with
+their number of records once they are complete, so that the output of a
+job resumed from a checkpoint can be cut back to the checkpointed offset.
+The shards of a previous run are otherwise never deleted, unless the
+writer is asked to overwrite them.
+"""
+import os
+import gzip
+import json
+import time
+import queue
+import typing
+import threading
+
+__all__ = ['CorpusWriter']
+
+MANIFEST = 'manifest.json'
+# Fields of a generated result kept in the corpus
+FIELDS = ('regex', 'canonical', 'complexity', 'length', 'examples', 'negative_examples', 'match_cost')
+# Queue item closing the current shard
+_ROTATE = 'rotate'
+
+
+class CorpusWriter:
+    """
+    Writer of `RegexGenerator.generate` results into `directory`
+
+    Args:
+        - directory: directory of the shards, which should hold no shards
+            of a previous run unless `resume_offset` or `overwrite` is given
+        - shard_bytes: a shard is closed once its size on disk reaches this
+        - batch_size: number of records handed to the background thread at once
+        - compress: whether to gzip the shards
+        - compress_level: gzip compression level
+        - queue_size: maximum number of pending batches
+        - resume_offset: number of records to keep from a previous run,
+            which should be at the end of a shard listed in the manifest.
+            The shards past it are deleted.
+        - overwrite: whether to delete the shards of a previous run
+            (without `resume_offset`)
+    """
+
+    def __init__(self, directory: str, shard_bytes: int = 64 * 2 ** 20, batch_size: int = 1024,
+                 compress: bool = True, compress_level: int = 6, queue_size: int = 8,
+                 resume_offset: typing.Optional[int] = None, overwrite: bool = False):
+        assert isinstance(shard_bytes, int) and shard_bytes > 0, 'shard_bytes should be > 0'
+        assert isinstance(batch_size, int) and batch_size > 0, 'batch_size should be > 0'
+        assert isinstance(queue_size, int) and queue_size > 0, 'queue_size should be > 0'
+        self._directory = directory
+        self._shard_bytes = shard_bytes
+        self._batch_size = batch_size
+        self._compress = compress
+        self._compress_level = compress_level
+        os.makedirs(directory, exist_ok=True)
+        if resume_offset is None:
+            self._shards = self._clear_shards(overwrite)
+        else:
+            self._shards = self._get_kept_shards(resume_offset)
+        self._batch = []
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error: typing.Optional[BaseException] = None
+        self._file = None
+        self._shard_records = 0
+        self._records = 0
+        self._batches = 0
+        self._raw_bytes = 0
+        self._written_bytes = 0
+        self._busy_seconds = 0.
+        self._blocked_seconds = 0.
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, result: dict):
+        """
+        Add a generated result to the current batch
+        """
+        self._batch.append({key: result[key] for key in FIELDS if key in result})
+        if len(self._batch) >= self._batch_size:
+            self._put(self._batch)
+            self._batch = []
+
+    def flush(self):
+        """
+        Block until all the results are written, and close the current
+        shard, so that a checkpoint taken afterwards is at a shard end
+        """
+        if self._batch:
+            self._put(self._batch)
+            self._batch = []
+        self._put(_ROTATE)
+        self._queue.join()
+        self._raise_error()
+
+    def close(self):
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+
+    def __enter__(self) -> 'CorpusWriter':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def stats(self) -> dict:
+        """
+        Throughput of the background thread and backpressure
+        on the generation thread
+        """
+        return {
+            'records': self._records,
+            'batches': self._batches,
+            'shards': len(self._shards),
+            'pending_batches': self._queue.qsize(),
+            'raw_bytes': self._raw_bytes,
+            'written_bytes': self._written_bytes,
+            'compression_ratio': self._raw_bytes / self._written_bytes if self._written_bytes else None,
+            'busy_seconds': self._busy_seconds,
+            'records_per_busy_second': self._records / self._busy_seconds if self._busy_seconds else None,
+            'blocked_seconds': self._blocked_seconds
+        }
+
+    def _put(self, item):
+        self._raise_error()
+        start = time.perf_counter()
+        self._queue.put(item)
+        self._blocked_seconds += time.perf_counter() - start
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise RuntimeError('corpus writer failed') from self._error
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                # Batches after an error are dropped until the writer is closed
+                if self._error is None:
+                    start = time.perf_counter()
+                    if item is None or item == _ROTATE:
+                        self._close_shard()
+                    else:
+                        self._write_batch(item)
+                    self._busy_seconds += time.perf_counter() - start
+            except BaseException as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+            if item is None:
+                return
+
+    def _write_batch(self, batch: typing.List[dict]):
+        data = ''.join(json.dumps(record) + '\n' for record in batch).encode()
+        self._raw_bytes += len(data)
+        if self._compress:
+            # Concatenated gzip members form a valid gzip file
+            data = gzip.compress(data, compresslevel=self._compress_level)
+        if self._file is None:
+            self._file = open(os.path.join(self._directory, self._get_shard_name(len(self._shards))), 'wb')
+        self._file.write(data)
+        self._written_bytes += len(data)
+        self._shard_records += len(batch)
+        self._records += len(batch)
+        self._batches += 1
+        if self._file.tell() >= self._shard_bytes:
+            self._close_shard()
+
+    def _close_shard(self):
+        """
+        Sync the current shard and list it in the manifest
+        """
+        if self._file is None:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._shards.append({
+            'name': os.path.basename(self._file.name),
+            'records': self._shard_records,
+        })
+        self._file = None
+        self._shard_records = 0
+        self._write_manifest()
+
+    def _write_manifest(self):
+        path = os.path.join(self._directory, MANIFEST)
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump({'shards': self._shards}, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f'{path}.tmp', path)
+
+    def _get_shard_name(self, index: int) -> str:
+        return f'part-{index:05d}.jsonl' + ('.gz' if self._compress else '')
+
+    def _clear_shards(self, overwrite: bool) -> typing.List[dict]:
+        """
+        Delete the shards and the manifest of a previous run if
+        `overwrite`, or refuse to write over them
+        """
+        names = [name for name in os.listdir(self._directory) if name.startswith('part-') or name == MANIFEST]
+        if names and not overwrite:
+            raise FileExistsError(f'{self._directory} holds the output of a previous run '
+                                  f'({len(names)} files), which is neither resumed nor overwritten')
+        for name in names:
+            os.remove(os.path.join(self._directory, name))
+        return []
+
+    def _get_kept_shards(self, offset: int) -> typing.List[dict]:
+        """
+        Keep the shards holding the first `offset` records and delete
+        the others, e.g., those written after the checkpoint
+        """
+        path = os.path.join(self._directory, MANIFEST)
+        shards = []
+        if os.path.exists(path):
+            with open(path) as f:
+                shards = json.load(f)['shards']
+        kept = []
+        records = 0
+        for shard in shards:
+            if records >= offset:
+                break
+            kept.append(shard)
+            records += shard['records']
+        assert records == offset, f'no shard of {self._directory} ends at record {offset}'
+        kept_names = {shard['name'] for shard in kept}
+        for name in os.listdir(self._directory):
+            if name.startswith('part-') and name not in kept_names:
+                os.remove(os.path.join(self._directory, name))
+        if len(kept) < len(shards):
+            self._shards = kept
+            self._write_manifest()
+        return kept
@@ -0,0 +1,208 @@
+"""
+Memory-bounded de-duplication store for generated regex
+
+A scalable bloom filter: a chain of rbloom filters where each new stage
+holds `growth` times more items than the previous one with a tightened
+false-positive rate, so that the overall false-positive rate stays
+below the target while the memory grows with the number of items
+actually added.
+
+Once the next stage does not fit into the memory budget, the filter
+stops growing and rotates instead: a stage as large as the latest one
+is opened, and the oldest stages are evicted to make room for it. The
+false-positive rate stays below the target, but the evicted items are
+forgotten, so their repeats are no longer detected.
+
+REF:
+Almeida et al., Scalable Bloom Filters (2007)
+"""
+import os
+import math
+import typing
+import hashlib
+import tempfile
+import warnings
+from rbloom import Bloom
+
+__all__ = ['ScalableBloom', 'stable_hash']
+
+
+def stable_hash(item: str) -> int:
+    """
+    128-bit hash of a string that, unlike `hash`, does not change
+    between processes, so that a filter can be saved and loaded
+    """
+    return int.from_bytes(hashlib.blake2b(item.encode(), digest_size=16).digest(), 'big', signed=True)
+
+
+class ScalableBloom:
+    """
+    Bloom filter that grows stage by stage until
+    the memory budget is reached, then rotates its stages
+
+    Args:
+        - max_bytes: memory budget of the stages. The first stage holds
+            fewer than `initial_capacity` items if needed to fit into it.
+        - hash_func: hash of the items (see `rbloom.Bloom`). The filter
+            can only be pickled with a hash_func, e.g., `stable_hash`.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 2 ** 20, error_rate: float = 0.01,
+                 initial_capacity: int = 4096, growth: int = 2, tightening: float = 0.5,
+                 hash_func: typing.Optional[typing.Callable[[typing.Any], int]] = None):
+        assert isinstance(max_bytes, int) and max_bytes > 0, 'max_bytes should be > 0'
+        assert isinstance(error_rate, float) and error_rate > 0.0 and error_rate < 1.0, 'error_rate should be a float in range (0, 1)'
+        assert isinstance(initial_capacity, int) and initial_capacity > 0, 'initial_capacity should be > 0'
+        assert isinstance(growth, int) and growth >= 1, 'growth should be >= 1'
+        assert isinstance(tightening, float) and tightening > 0.0 and tightening < 1.0, 'tightening should be a float in range (0, 1)'
+        self._max_bytes = max_bytes
+        self._error_rate = error_rate
+        self._growth = growth
+        self._tightening = tightening
+        self._hash_func = hash_func
+        self._stages: typing.List[Bloom] = []
+        self._capacities: typing.List[int] = []
+        self._error_rates: typing.List[float] = []
+        self._stage_items: typing.List[int] = []
+        self._items = 0
+        self._evicted_items = 0
+        self._saturated = False
+        first_error_rate = error_rate * (1. - tightening)
+        bytes_per_item = ScalableBloom._estimate_bytes(2 ** 20, first_error_rate) / 2 ** 20
+        self._initial_capacity = min(initial_capacity, int(max_bytes / bytes_per_item))
+        assert self._initial_capacity > 0 and ScalableBloom._estimate_bytes(
+            self._initial_capacity, first_error_rate) <= max_bytes, \
+            f'max_bytes is too small for a single item at error_rate {error_rate}'
+        self._add_stage()
+
+    def __contains__(self, item) -> bool:
+        for stage in self._stages:
+            if item in stage:
+                return True
+        return False
+
+    def add(self, item):
+        """
+        Add an item to the latest stage, opening a new stage
+        (or rotating the stages) when the latest one is full
+        """
+        if self._stage_items[-1] >= self._capacities[-1]:
+            self._add_stage()
+        self._stages[-1].add(item)
+        self._stage_items[-1] += 1
+        self._items += 1
+
+    def __len__(self) -> int:
+        return self._items
+
+    @property
+    def capacity(self) -> int:
+        """
+        Number of items the allocated stages hold within the target error rate
+        """
+        return sum(self._capacities)
+
+    @property
+    def fill_ratio(self) -> float:
+        """
+        Items held by the stages over their capacity (at most 1.0)
+        """
+        return sum(self._stage_items) / self.capacity
+
+    @property
+    def saturated(self) -> bool:
+        """
+        Whether the memory budget is used up, so that the stages rotate
+        """
+        return self._saturated
+
+    @property
+    def evicted_items(self) -> int:
+        """
+        Number of items forgotten with the evicted stages
+        """
+        return self._evicted_items
+
+    @property
+    def size_in_bytes(self) -> int:
+        return sum(stage.size_in_bits for stage in self._stages) // 8
+
+    def copy(self) -> 'ScalableBloom':
+        """
+        Snapshot of the filter, which is not changed by adding
+        more items to this one
+        """
+        result = object.__new__(ScalableBloom)
+        result.__dict__.update(self.__dict__)
+        result._stages = [stage.copy() for stage in self._stages]
+        result._capacities = list(self._capacities)
+        result._error_rates = list(self._error_rates)
+        result._stage_items = list(self._stage_items)
+        return result
+
+    def __getstate__(self) -> dict:
+        """
+        The stages are pickled by the bytes of their saved files
+        """
+        assert self._hash_func is not None, 'only a filter with a hash_func can be pickled'
+        state = dict(self.__dict__)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'stage')
+            stages = []
+            for stage in self._stages:
+                stage.save(path)
+                with open(path, 'rb') as f:
+                    stages.append(f.read())
+        state['_stages'] = stages
+        return state
+
+    def __setstate__(self, state: dict):
+        stages = state.pop('_stages')
+        self.__dict__.update(state)
+        self._stages = []
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'stage')
+            for data in stages:
+                with open(path, 'wb') as f:
+                    f.write(data)
+                self._stages.append(Bloom.load(path, self._hash_func))
+
+    def _add_stage(self):
+        """
+        Allocate the next stage if it fits into the memory budget,
+        or else a copy of the latest stage in place of the oldest stages
+        """
+        if not self._saturated:
+            index = len(self._stages)
+            capacity = self._initial_capacity * self._growth ** index
+            # The first stage gets error_rate * (1 - tightening) so that
+            # the sum over all stages converges to error_rate.
+            error_rate = self._error_rate * (1. - self._tightening) * self._tightening ** index
+            if self._stages and self.size_in_bytes + \
+                    ScalableBloom._estimate_bytes(capacity, error_rate) > self._max_bytes:
+                self._saturated = True
+                warnings.warn(
+                    f'dedupe memory budget of {self._max_bytes} bytes is used up '
+                    f'after {self._items} items; the oldest items will be forgotten')
+        if self._saturated:
+            # The evicted stages have higher error rates than the latest
+            # one, so the sum of the error rates does not grow
+            capacity = self._capacities[-1]
+            error_rate = self._error_rates[-1]
+            stage_bytes = ScalableBloom._estimate_bytes(capacity, error_rate)
+            while self._stages and self.size_in_bytes + stage_bytes > self._max_bytes:
+                self._stages.pop(0)
+                self._capacities.pop(0)
+                self._error_rates.pop(0)
+                self._evicted_items += self._stage_items.pop(0)
+        if self._hash_func is None:
+            self._stages.append(Bloom(capacity, error_rate))
+        else:
+            self._stages.append(Bloom(capacity, error_rate, self._hash_func))
+        self._capacities.append(capacity)
+        self._error_rates.append(error_rate)
+        self._stage_items.append(0)
+
+    @staticmethod
+    def _estimate_bytes(capacity: int, error_rate: float) -> int:
+        return math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2 / 8)
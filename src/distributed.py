@@ -0,0 +1,273 @@
+"""
+Generation across nodes with a coordinator and workers over sockets
+
+The coordinator splits a range of seeds into seed ranges and serves:
+- a work queue: workers lease the seed ranges one at a time, and
+    a range leased by a worker that disconnects before completing it
+    is leased again to another worker
+- a dedupe service: workers send the 128-bit fingerprints (`stable_hash`)
+    of the canonical forms (or of the regex) of a batch, and only send
+    the records of those seen for the first time by any worker
+- a sink: the accepted records are handed to a callable, e.g.,
+    `CorpusWriter.write`, in the coordinator process
+
+Each seed of a range generates `records_per_seed` results with its own
+`RegexGenerator(seed=seed)`, so that the records of a seed range leased
+again are the same as before, and those already sent are dropped as
+repeats. The fingerprints accepted by the dedupe service are only added
+to its filter once their records are received, so the records of a
+worker that disconnects in between are not lost as repeats.
+
+The connections are `multiprocessing.connection` sockets authenticated
+by a shared key, so that a coordinator and its workers can run on one
+machine, e.g., for testing, as well as on several machines.
+
+NOTE: the messages are pickled, and unpickling a message can run any
+code, so the key must be kept secret: anyone holding it can run code
+in the coordinator and in the workers. There is no default key, and the
+coordinator should not listen on an untrusted network.
+"""
+import time
+import typing
+import itertools
+import threading
+from multiprocessing.connection import Listener, Client, Connection
+from toolz.itertoolz import partition_all
+from src.dedupe import ScalableBloom, stable_hash
+from src.corpus_writer import FIELDS
+
+__all__ = ['Coordinator', 'run_worker', 'parse_address']
+
+
+def parse_address(address: str) -> typing.Tuple[str, int]:
+    """
+    Socket address of 'host:port'
+    """
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+
+class Coordinator:
+    """
+    Work queue and dedupe service of the distributed generation
+
+    Args:
+        - address: (host, port) to listen to
+        - authkey: secret key shared with the workers
+        - sink: called with each accepted record
+        - seeds: range of the seeds to generate from
+        - range_size: number of seeds of a lease
+        - records_per_seed: number of results generated from each seed
+        - dedupe_max_bytes: memory budget of the dedupe filter
+        - dedupe_error_rate: false-positive rate of the dedupe filter
+    """
+
+    def __init__(self, address: typing.Tuple[str, int], authkey: bytes,
+                 sink: typing.Callable[[dict], None], seeds: range,
+                 range_size: int = 16, records_per_seed: int = 1000,
+                 dedupe_max_bytes: int = 64 * 2 ** 20, dedupe_error_rate: float = 0.01):
+        assert isinstance(authkey, bytes) and authkey, 'authkey should be non-empty bytes'
+        assert isinstance(range_size, int) and range_size > 0, 'range_size should be > 0'
+        assert isinstance(records_per_seed, int) and records_per_seed > 0, 'records_per_seed should be > 0'
+        self._listener = Listener(address, authkey=authkey)
+        self._sink = sink
+        self._records_per_seed = records_per_seed
+        self._bloom = ScalableBloom(
+            max_bytes=dedupe_max_bytes,
+            error_rate=dedupe_error_rate,
+            # The fingerprints are already hashed by the workers
+            hash_func=_get_fingerprint
+        )
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self._pending_ranges = [
+            (start, min(start + range_size, seeds.stop))
+            for start in range(seeds.start, seeds.stop, range_size)
+        ]
+        # Reversed so that the ranges are leased in order by pop()
+        self._pending_ranges.reverse()
+        self._leased_ranges: typing.Dict[int, typing.Tuple[int, int]] = {}
+        # Fingerprints accepted by the dedupe service, by worker,
+        # until their records are received
+        self._reserved: typing.Dict[int, int] = {}
+        self._ranges = len(self._pending_ranges)
+        self._completed = 0
+        self._leases = 0
+        self._workers = 0
+        self._records = 0
+        self._repeats = 0
+        self._start = time.monotonic()
+
+    @property
+    def address(self) -> typing.Tuple[str, int]:
+        return self._listener.address
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            elapsed = time.monotonic() - self._start
+            return {
+                'ranges': self._ranges,
+                'completed_ranges': self._completed,
+                'leases': self._leases,
+                'workers': self._workers,
+                'records': self._records,
+                'repeats': self._repeats,
+                'records_per_second': self._records / elapsed if elapsed else None,
+                'dedupe_fill_ratio': self._bloom.fill_ratio,
+                'dedupe_evicted': self._bloom.evicted_items
+            }
+
+    def serve(self, timeout: typing.Optional[float] = None, drain_timeout: float = 10.0) -> bool:
+        """
+        Accept workers until all the seed ranges are completed,
+        and return whether they are
+
+        Args:
+            - timeout: seconds to serve at most (None for no limit)
+            - drain_timeout: seconds to wait for the connected workers
+                to be told that the ranges are completed
+        """
+        thread = threading.Thread(target=self._accept, daemon=True)
+        thread.start()
+        try:
+            finished = self._finished.wait(timeout) or self._ranges == 0
+            deadline = time.monotonic() + drain_timeout
+            while finished and self._workers and time.monotonic() < deadline:
+                time.sleep(0.05)
+            return finished
+        finally:
+            self._listener.close()
+
+    def _accept(self):
+        while not self._finished.is_set():
+            try:
+                connection = self._listener.accept()
+            except OSError:
+                # The listener is closed
+                return
+            except Exception:
+                # e.g., a client with another authkey
+                continue
+            threading.Thread(target=self._handle, args=(connection,), daemon=True).start()
+
+    def _handle(self, connection: Connection):
+        """
+        Serve the requests of a worker until it disconnects
+        """
+        worker = id(connection)
+        with self._lock:
+            self._workers += 1
+        try:
+            while True:
+                request, *args = connection.recv()
+                if request == 'lease':
+                    connection.send(self._lease(worker))
+                elif request == 'dedupe':
+                    connection.send(self._dedupe(worker, *args))
+                elif request == 'records':
+                    self._add_records(worker, *args)
+                elif request == 'complete':
+                    self._complete(worker)
+                else:
+                    raise ValueError(f'unknown request: {request!r}')
+        except (EOFError, OSError):
+            pass
+        finally:
+            connection.close()
+            with self._lock:
+                self._workers -= 1
+                for fingerprint in [x for x, owner in self._reserved.items() if owner == worker]:
+                    del self._reserved[fingerprint]
+                if worker in self._leased_ranges:
+                    # Lease the range again to another worker
+                    self._pending_ranges.append(self._leased_ranges.pop(worker))
+
+    def _lease(self, worker: int) -> tuple:
+        with self._lock:
+            if not self._pending_ranges:
+                return ('wait',) if self._leased_ranges else ('done',)
+            start, stop = self._pending_ranges.pop()
+            self._leased_ranges[worker] = (start, stop)
+            self._leases += 1
+            return ('range', start, stop, self._records_per_seed)
+
+    def _dedupe(self, worker: int, fingerprints: typing.List[int]) -> typing.List[bool]:
+        """
+        Whether each fingerprint is seen for the first time, in which
+        case it is reserved by the worker until its record is received
+        """
+        with self._lock:
+            result = []
+            for fingerprint in fingerprints:
+                new = fingerprint not in self._reserved and fingerprint not in self._bloom
+                if new:
+                    self._reserved[fingerprint] = worker
+                else:
+                    self._repeats += 1
+                result.append(new)
+            return result
+
+    def _add_records(self, worker: int, fingerprints: typing.List[int], records: typing.List[dict]):
+        with self._lock:
+            for fingerprint, record in zip(fingerprints, records):
+                self._sink(record)
+                self._bloom.add(fingerprint)
+                del self._reserved[fingerprint]
+            self._records += len(records)
+
+    def _complete(self, worker: int):
+        with self._lock:
+            del self._leased_ranges[worker]
+            self._completed += 1
+            if self._completed == self._ranges:
+                self._finished.set()
+
+
+def run_worker(address: typing.Tuple[str, int], authkey: bytes, generator_class,
+               generator_kwargs: typing.Optional[dict] = None, batch_size: int = 64,
+               poll_interval: float = 1.0) -> int:
+    """
+    Lease seed ranges from the coordinator until all of them are
+    completed, and return the number of records sent
+
+    Args:
+        - generator_class: `RegexGenerator` or a subclass
+        - generator_kwargs: arguments of the generator but the seed
+        - batch_size: number of results deduped at once
+        - poll_interval: seconds to wait while the last ranges are
+            leased to other workers, which may disconnect
+    """
+    assert isinstance(authkey, bytes) and authkey, 'authkey should be non-empty bytes'
+    generator_kwargs = dict(generator_kwargs or {})
+    key = 'canonical' if generator_kwargs.get('canonical_dedupe', True) else 'regex'
+    sent = 0
+    with Client(address, authkey=authkey) as connection:
+        while True:
+            connection.send(('lease',))
+            reply, *args = connection.recv()
+            if reply == 'done':
+                return sent
+            if reply == 'wait':
+                time.sleep(poll_interval)
+                continue
+            start, stop, records_per_seed = args
+            for seed in range(start, stop):
+                generator = generator_class(seed=seed, **generator_kwargs)
+                results = itertools.islice(generator.generate(), records_per_seed)
+                for batch in partition_all(batch_size, results):
+                    fingerprints = [stable_hash(x[key]) for x in batch]
+                    connection.send(('dedupe', fingerprints))
+                    new = connection.recv()
+                    kept = [i for i, x in enumerate(new) if x]
+                    connection.send((
+                        'records',
+                        [fingerprints[i] for i in kept],
+                        [{field: batch[i][field] for field in FIELDS if field in batch[i]} for i in kept]
+                    ))
+                    sent += len(kept)
+            connection.send(('complete',))
+
+
+def _get_fingerprint(fingerprint: int) -> int:
+    return fingerprint
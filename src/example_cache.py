@@ -0,0 +1,97 @@
+"""
+Bounded cache of the examples of sub-patterns
+
+Generated regex share many of their sub-patterns (the same escapes,
+special chars and small amounts show up again and again), so the
+examples of a sub-pattern enumerated for one regex can be reused by
+the following ones.
+
+The sub-patterns are keyed by their ordered canonical form (see
+`src.canonical`), so that equivalent sub-patterns rendered differently,
+e.g., `((a){1})` and `(a)`, share their examples, while the examples
+keep the enumeration order of exrex.
+"""
+import sys
+import typing
+from collections import OrderedDict
+from src.pattern_tree import PatternNode, CharNode, GroupNode
+from src.canonical import canonicalize
+
+__all__ = ['ExampleCache']
+
+
+class ExampleCache:
+    """
+    LRU cache mapping the ordered canonical form of a sub-pattern to its examples
+
+    Args:
+        - maxsize: maximum number of cached sub-patterns
+        - max_entry_examples: sub-patterns with more examples than this
+            are enumerated without being cached
+    """
+
+    def __init__(self, maxsize: int = 4096, max_entry_examples: int = 1024):
+        assert isinstance(maxsize, int) and maxsize > 0, 'maxsize should be > 0'
+        assert isinstance(max_entry_examples, int) and max_entry_examples > 0, 'max_entry_examples should be > 0'
+        self._maxsize = maxsize
+        self._max_entry_examples = max_entry_examples
+        self._entries: typing.OrderedDict[str, typing.Tuple[str, ...]] = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+
+    def examples(self, node: PatternNode) -> typing.Iterable[str]:
+        """
+        Examples of a sub-pattern, enumerated with the examples of
+        its own sub-patterns taken from the cache
+        """
+        if isinstance(node, CharNode):
+            return node.alphabet
+        if isinstance(node, GroupNode):
+            return self.examples(node.child)
+        if node.count > self._max_entry_examples:
+            return node.examples(cache=self)
+        key = canonicalize(node, ordered=True)
+        try:
+            examples = self._entries[key]
+        except KeyError:
+            self._misses += 1
+            examples = tuple(node.examples(cache=self))
+            self._put(key, examples)
+            return examples
+        self._hits += 1
+        self._entries.move_to_end(key)
+        return examples
+
+    def _put(self, key: str, examples: typing.Tuple[str, ...]):
+        self._entries[key] = examples
+        self._bytes += ExampleCache._get_entry_bytes(key, examples)
+        while len(self._entries) > self._maxsize:
+            evicted_key, evicted_examples = self._entries.popitem(last=False)
+            self._bytes -= ExampleCache._get_entry_bytes(evicted_key, evicted_examples)
+
+    @staticmethod
+    def _get_entry_bytes(key: str, examples: typing.Tuple[str, ...]) -> int:
+        """
+        Approximate memory held by an entry (strings shared with
+        other objects are counted as well)
+        """
+        return sys.getsizeof(key) + sys.getsizeof(examples) + sum(map(sys.getsizeof, examples))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def stats(self) -> dict:
+        """
+        Hit rate and memory use of the cache
+        """
+        total = self._hits + self._misses
+        return {
+            'hits': self._hits,
+            'misses': self._misses,
+            'hit_rate': self._hits / total if total else 0.0,
+            'size': len(self._entries),
+            'maxsize': self._maxsize,
+            'bytes': self._bytes
+        }
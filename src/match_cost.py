@@ -0,0 +1,141 @@
+"""
+Cost of matching generated regex with `re`
+
+Each regex is fullmatched against a sample of its examples and against
+near misses of them (its negative examples if any, or the examples with
+a char appended, removed or replaced), where backtracking matchers tend
+to spend the most steps before failing. `re` does not expose its step
+counts, so the cost is the wall time of each match, summarized by
+percentiles.
+
+The matches of a regex are cut off after `time_cap` seconds. In the main
+thread, a SIGALRM timer interrupts a match in progress (`re` checks for
+signals while backtracking); elsewhere, the cap is checked between
+matches only. The SIGALRM handler is only installed while the matches
+of a regex are timed, and the previous handler is restored after them.
+"""
+import math
+import time
+import random
+import signal
+import typing
+import threading
+
+__all__ = ['MatchCostProfiler']
+
+# Chars appended to or replaced into the examples for near misses,
+# which are unlikely to be matched where the example chars are
+_MISS_CHARS = '!\x00 a0'
+
+
+class _MatchTimeout(Exception):
+    pass
+
+
+class MatchCostProfiler:
+    """
+    Timer of the matches of a regex against its examples and near misses
+
+    Args:
+        - time_cap: seconds of matching a single regex at most
+        - max_examples: number of examples sampled for the matches
+        - seed: seed of sampling the examples and the near misses
+    """
+
+    def __init__(self, time_cap: float = 0.05, max_examples: int = 16, seed: typing.Optional[int] = None):
+        assert isinstance(time_cap, float) and time_cap > 0.0, 'time_cap should be a float > 0'
+        assert isinstance(max_examples, int) and max_examples > 0, 'max_examples should be > 0'
+        self._time_cap = time_cap
+        self._max_examples = max_examples
+        self._random = random.Random(seed)
+
+    def profile(self, compiled: typing.Pattern, examples: typing.List[str],
+                near_misses: typing.Optional[typing.List[str]] = None) -> dict:
+        """
+        Time the fullmatches of a compiled regex against examples and
+        near misses, which are mutated from the examples if not provided
+
+        Returns:
+            - matches: number of matches timed
+            - hit_p50_ns, hit_max_ns: percentiles of the matches of examples
+            - miss_p50_ns, miss_p90_ns, miss_max_ns: percentiles of the
+                matches of near misses
+            - total_ns: time of all the matches
+            - timed_out: whether the matches were cut off by the time cap,
+                in which case the cost is at least the cap
+            - bucket: power of 2 of the largest match time in microseconds,
+                e.g., 3 for [8, 16) microseconds
+        """
+        if len(examples) > self._max_examples:
+            examples = self._random.sample(examples, self._max_examples)
+        if near_misses:
+            near_misses = near_misses[:self._max_examples]
+        else:
+            near_misses = [self._get_near_miss(example) for example in examples]
+        hits = []
+        misses = []
+        timed_out = False
+        use_alarm = hasattr(signal, 'setitimer') and \
+            threading.current_thread() is threading.main_thread()
+        deadline = time.perf_counter_ns() + int(self._time_cap * 1e9)
+        try:
+            if use_alarm:
+                previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+            try:
+                if use_alarm:
+                    signal.setitimer(signal.ITIMER_REAL, self._time_cap)
+                for inputs, times in ((examples, hits), (near_misses, misses)):
+                    for x in inputs:
+                        start = time.perf_counter_ns()
+                        compiled.fullmatch(x)
+                        end = time.perf_counter_ns()
+                        times.append(end - start)
+                        if end > deadline:
+                            raise _MatchTimeout()
+            finally:
+                if use_alarm:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+                    signal.signal(signal.SIGALRM, previous_handler)
+        except _MatchTimeout:
+            # Also raised by an alarm going off before it is disarmed
+            timed_out = True
+        total = sum(hits) + sum(misses)
+        largest = int(self._time_cap * 1e9) if timed_out else max(hits + misses, default=0)
+        return {
+            'matches': len(hits) + len(misses),
+            'hit_p50_ns': _get_percentile(hits, 0.5),
+            'hit_max_ns': max(hits, default=None),
+            'miss_p50_ns': _get_percentile(misses, 0.5),
+            'miss_p90_ns': _get_percentile(misses, 0.9),
+            'miss_max_ns': max(misses, default=None),
+            'total_ns': total,
+            'timed_out': timed_out,
+            'bucket': int(math.log2(largest / 1000)) if largest >= 1000 else 0
+        }
+
+    def _get_near_miss(self, example: str) -> str:
+        """
+        Append, remove or replace a char of an example
+        """
+        kind = self._random.randrange(3) if example else 0
+        char = self._random.choice(_MISS_CHARS)
+        if kind == 0:
+            return example + char
+        i = self._random.randrange(len(example))
+        if kind == 1:
+            return example[:i] + example[i + 1:]
+        return example[:i] + char + example[i + 1:]
+
+
+def _raise_timeout(*_):
+    raise _MatchTimeout()
+
+
+def _get_percentile(times: typing.List[int], q: float) -> typing.Optional[int]:
+    """
+    Nearest-rank percentile
+    """
+    if not times:
+        return None
+    ordered = sorted(times)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
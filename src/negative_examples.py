@@ -0,0 +1,194 @@
+"""
+Near-miss negative examples of generated regex
+
+Random strings are nearly never matched by a regex, but they are also
+far from its examples, so the negative examples are mutants of the
+positive examples instead, one edit away from a match:
+
+- class swap: a char replaced by a char of another class
+    (digit, lowercase, uppercase, whitespace or punctuation)
+- insertion: a char inserted anywhere, of any class
+- deletion: a char removed
+- amount boundary: a string of the pattern tree with the repeats of one
+    of its amounts one below its lower bound or one above its upper bound
+
+A mutant can still be matched, e.g., a char swapped for another char of
+a set, so the mutants are checked against the compiled regex, and only
+those that do not fullmatch are kept.
+
+NOTE: the mutations draw from the `random` module, so that they follow
+the seed (and the checkpoints) of the generator. The draws of the
+mutations scale `random.random()`, which takes half the time of
+`random.randrange` and `random.choice`, with a negligible bias for the
+small ranges drawn from.
+"""
+import random
+import string
+import typing
+from src.pattern_tree import (
+    PatternNode,
+    ConcatNode,
+    GroupNode,
+    OrNode,
+    AmountNode,
+    OptionalNode
+)
+
+__all__ = ['NegativeExampleGenerator']
+
+CHAR_CLASSES = (
+    string.digits,
+    string.ascii_lowercase,
+    string.ascii_uppercase,
+    ' \t\n',
+    string.punctuation
+)
+MUTATIONS = ('class_swap', 'insertion', 'deletion', 'amount_boundary')
+# Classes other than the class of each char, for class swaps
+_OTHER_CLASSES = {
+    char: tuple(x for x in CHAR_CLASSES if x is not chars)
+    for chars in CHAR_CLASSES
+    for char in chars
+}
+
+
+class NegativeExampleGenerator:
+    """
+    Mutate the examples of a regex into strings it does not fullmatch
+
+    Args:
+        - count: number of negative examples of a regex
+        - max_rounds: the mutants of a regex are drawn one at a time,
+            up to `max_rounds * 2 * count` of them, before giving up on
+            finding `count` negative examples
+    """
+
+    def __init__(self, count: int, max_rounds: int = 4):
+        assert isinstance(count, int) and count > 0, 'count should be > 0'
+        assert isinstance(max_rounds, int) and max_rounds > 0, 'max_rounds should be > 0'
+        self._count = count
+        self._max_rounds = max_rounds
+
+    def generate(self, tree: PatternNode, compiled: typing.Pattern,
+                 examples: typing.List[str]) -> typing.List[str]:
+        """
+        Up to `count` distinct negative examples of the regex,
+        fewer if not enough of the mutants are true non-matches
+        """
+        fullmatch = compiled.fullmatch
+        positives = set(examples)
+        # Computed on the first amount boundary mutation only
+        amounts = None
+        # De-duplicated in order, as sets of strings are ordered by
+        # their hashes, which change between processes
+        negatives = {}
+        for _ in range(self._max_rounds * 2 * self._count):
+            kind = _draw(len(MUTATIONS))
+            if kind == 3:
+                if amounts is None:
+                    amounts = _get_amount_paths(tree)
+                if not amounts:
+                    kind = _draw(len(MUTATIONS) - 1)
+            mutant = _mutate(tree, amounts, examples, kind)
+            # Mutants equal to an example or a negative found before skip the regex
+            if mutant in positives or mutant in negatives:
+                continue
+            if fullmatch(mutant) is None:
+                negatives[mutant] = None
+                if len(negatives) == self._count:
+                    break
+        return list(negatives)
+
+
+def _mutate(tree: PatternNode, amounts: typing.Optional[typing.List[typing.List[PatternNode]]],
+            examples: typing.List[str], kind: int) -> str:
+    """
+    Mutant of a random example by the mutation `MUTATIONS[kind]`
+    """
+    if kind == 3:
+        return _sample_amount_boundary(tree, random.choice(amounts))
+    example = examples[_draw(len(examples))]
+    if kind == 0 and example:
+        i = _draw(len(example))
+        return example[:i] + _draw_char(_OTHER_CLASSES.get(example[i], CHAR_CLASSES)) + example[i + 1:]
+    if kind == 2 and example:
+        i = _draw(len(example))
+        return example[:i] + example[i + 1:]
+    i = _draw(len(example) + 1)
+    return example[:i] + _draw_char(CHAR_CLASSES) + example[i:]
+
+
+def _draw(n: int) -> int:
+    """
+    Random int in [0, n)
+    """
+    return int(random.random() * n)
+
+
+def _draw_char(classes: typing.Sequence[str]) -> str:
+    """
+    Random char of a random class
+    """
+    chars = classes[_draw(len(classes))]
+    return chars[_draw(len(chars))]
+
+
+def _get_amount_paths(tree: PatternNode) -> typing.List[typing.List[PatternNode]]:
+    """
+    Paths from the root to each amount whose bounds can be crossed
+    """
+    paths = []
+    stack = [[tree]]
+    while stack:
+        path = stack.pop()
+        node = path[-1]
+        if isinstance(node, AmountNode) and node.child.count:
+            paths.append(path)
+        if isinstance(node, (ConcatNode, OrNode)):
+            stack.extend(path + [child] for child in node.children)
+        elif isinstance(node, AmountNode) and node.amounts[-1] == 0:
+            # The child is never repeated
+            continue
+        elif isinstance(node, (GroupNode, AmountNode, OptionalNode)):
+            stack.append(path + [node.child])
+    return paths
+
+
+def _sample_amount_boundary(tree: PatternNode, path: typing.List[PatternNode]) -> str:
+    """
+    Random string of the tree, but with the amount at the end of the
+    path repeated once less than its lower bound or once more than its
+    upper bound
+    """
+    target = path[-1]
+    amounts = target.amounts
+    choices = [amounts[-1] + 1]
+    if amounts[0] > 0:
+        choices.append(amounts[0] - 1)
+    return _sample_along(tree, path, 0, random.choice(choices))
+
+
+def _sample_along(node: PatternNode, path: typing.List[PatternNode], depth: int, amount: int) -> str:
+    """
+    Random string of the node, which is `path[depth]`
+    """
+    if depth == len(path) - 1:
+        return ''.join(_sample(node.child) for _ in range(amount))
+    child = path[depth + 1]
+    if isinstance(node, ConcatNode):
+        return ''.join(
+            _sample_along(x, path, depth + 1, amount) if x is child else _sample(x)
+            for x in node.children)
+    if isinstance(node, AmountNode):
+        # At least one repeat holds the target amount
+        repeats = random.choice([x for x in node.amounts if x > 0])
+        return _sample_along(child, path, depth + 1, amount) + \
+            ''.join(_sample(child) for _ in range(repeats - 1))
+    # Group, Or or Optional: only the child on the path
+    return _sample_along(child, path, depth + 1, amount)
+
+
+def _sample(node: PatternNode) -> str:
+    if not node.count:
+        return ''
+    return node.unrank(random.randrange(node.count))
@@ -0,0 +1,452 @@
+"""
+Pattern tree built by the PatternGenerator
+
+Each node keeps its children together with the number of strings exrex
+enumerates for it (its complexity) and the length of its regex. Both are
+derived from the children while the tree is built, so the complexity and
+the length of a generated regex are known without rendering it. The regex
+string is rendered once, when it is first asked for, and the regexfactory
+pattern is only built on demand by `pattern`.
+Likewise, `examples()` lazily enumerates the matched strings from the
+children in the order of `exrex.generate`, and `unrank(i)` directly builds
+the i-th of them, which allows uniform sampling of examples from
+patterns of any complexity.
+
+NOTE:
+The counts follow exrex (limit=20) exactly, including its quirks:
+- `\\S` and `\\D` enumerate a single empty string
+- `.` and negated sets are taken from the chars 32 ~ 122
+- repeats of more than 20 amounts are cut at the 20th amount
+Unlike exrex, the enumeration also works for empty groups, e.g., `()`,
+which `has_empty_group` finds so that they can be rejected like exrex does.
+"""
+import re
+import sys
+import typing
+import random
+import itertools
+import exrex
+from regexfactory.pattern import escape, join
+from regexfactory.pattern import RegexPattern
+from regexfactory.patterns import (
+    Range,
+    Set,
+    NotSet,
+    Group,
+    Or,
+    Amount,
+    Optional
+)
+
+__all__ = [
+    'PatternNode',
+    'CharNode',
+    'RangeNode',
+    'SetNode',
+    'ConcatNode',
+    'GroupNode',
+    'OrNode',
+    'AmountNode',
+    'OptionalNode',
+    'has_empty_group'
+]
+
+# The repeat limit exrex uses by default
+REPEAT_LIMIT = 20
+ANY_ALPHABET = tuple(exrex.generate('.'))
+
+
+class PatternNode:
+    """
+    Base node of the pattern tree
+
+    Attributes:
+        - count: number of strings enumerated by exrex
+        - length: length of the regex
+    """
+    __slots__ = ('count', 'length', '_regex')
+
+    @property
+    def regex(self) -> str:
+        """
+        The regex string, rendered on the first access
+        """
+        if self._regex is None:
+            parts = []
+            self._render(parts)
+            self._regex = ''.join(parts)
+        return self._regex
+
+    @property
+    def pattern(self) -> RegexPattern:
+        """
+        The regexfactory pattern, built on every access
+        """
+        raise NotImplementedError
+
+    def _render(self, parts: typing.List[str]):
+        """
+        Append the pieces of the regex to parts
+        """
+        raise NotImplementedError
+
+    def _write(self, parts: typing.List[str]):
+        """
+        Append the regex to parts, reusing it if already rendered
+        """
+        if self._regex is None:
+            self._render(parts)
+        else:
+            parts.append(self._regex)
+
+    def examples(self, cache=None) -> typing.Iterator[str]:
+        """
+        Lazily enumerate the strings matched by the pattern
+
+        Args:
+            - cache: an ExampleCache providing the examples of sub-patterns
+        """
+        raise NotImplementedError
+
+    def unrank(self, index: int) -> str:
+        """
+        Build the index-th string of `examples()`
+        """
+        raise NotImplementedError
+
+    def sample_examples(self, k: int) -> typing.List[str]:
+        """
+        Uniformly sample k of the enumerated strings without replacement
+        (all of them if there are no more than k), in enumeration order.
+        Each sample costs one walk down the tree.
+        """
+        if self.count <= k:
+            return list(self.examples())
+        if self.count <= sys.maxsize:
+            indices = random.sample(range(self.count), k)
+        else:
+            # k is far below count, so repeated draws are rare
+            indices = set()
+            while len(indices) < k:
+                indices.add(random.randrange(self.count))
+        return [self.unrank(index) for index in sorted(indices)]
+
+    def __repr__(self) -> str:
+        return f'<{self.__class__.__name__} {self.regex!r} count={self.count}>'
+
+
+class CharNode(PatternNode):
+    """
+    Single-char pattern with the chars it can be enumerated into
+
+    Args:
+        - regex: the char pattern
+        - alphabet: chars matched by the pattern in the enumeration
+            order of exrex. If not provided, it is enumerated by exrex once
+            (only meant for constant chars built at module setup).
+    """
+    __slots__ = ('alphabet',)
+
+    def __init__(self, regex: str,
+                 alphabet: typing.Optional[typing.Tuple[str, ...]] = None):
+        self._regex = regex
+        if alphabet is None:
+            alphabet = tuple(exrex.generate(regex))
+        self.alphabet = alphabet
+        self.count = len(alphabet)
+        self.length = len(regex)
+
+    @property
+    def pattern(self) -> RegexPattern:
+        return RegexPattern(self._regex)
+
+    def examples(self, cache=None) -> typing.Iterator[str]:
+        return iter(self.alphabet)
+
+    def unrank(self, index: int) -> str:
+        return self.alphabet[index]
+
+
+class RangeNode(CharNode):
+    """
+    [s-e] pattern of two printable chars s <= e
+    """
+    __slots__ = ('start', 'stop')
+
+    def __init__(self, start: str, stop: str):
+        assert ord(start) <= ord(stop), 'start of range should not be larger than stop'
+        self.start = start
+        self.stop = stop
+        super().__init__(
+            f'[{re.escape(start)}-{re.escape(stop)}]',
+            tuple(chr(x) for x in range(ord(start), ord(stop) + 1))
+        )
+
+    @property
+    def pattern(self) -> RegexPattern:
+        return Range(escape(self.start), escape(self.stop))
+
+
+class SetNode(CharNode):
+    """
+    [...] or [^...] pattern of single-char nodes
+    """
+    __slots__ = ('chars', 'negate')
+
+    def __init__(self, chars: typing.List[CharNode], negate: bool = False):
+        self.chars = chars
+        self.negate = negate
+        members = ''.join([char.regex for char in chars])
+        super().__init__(
+            f'[^{members}]' if negate else f'[{members}]',
+            SetNode._get_alphabet(chars, negate)
+        )
+
+    @property
+    def pattern(self) -> RegexPattern:
+        members = join(*[char.pattern for char in self.chars])
+        if self.negate:
+            return NotSet(members)
+        return Set(members)
+
+    @staticmethod
+    def _get_alphabet(chars: typing.List[CharNode],
+                      negate: bool) -> typing.Tuple[str, ...]:
+        """
+        Repeated members of the set are dropped by the regex parser,
+        while overlapping members are kept by exrex.
+        """
+        members = {char.regex: char for char in chars}.values()
+        if negate:
+            excluded = set()
+            for char in members:
+                excluded.update(char.alphabet)
+            return tuple(x for x in ANY_ALPHABET if x not in excluded)
+        else:
+            alphabet = []
+            for char in members:
+                alphabet.extend(char.alphabet)
+            return tuple(alphabet)
+
+
+class ConcatNode(PatternNode):
+    """
+    Patterns joined one after another
+    """
+    __slots__ = ('children',)
+
+    def __init__(self, children: typing.List[PatternNode]):
+        self.children = children
+        self._regex = None
+        if children:
+            count = 1
+            for child in children:
+                count *= child.count
+        else:
+            # exrex counts an empty regex as 0
+            count = 0
+        self.count = count
+        self.length = sum(child.length for child in children)
+
+    @property
+    def pattern(self) -> RegexPattern:
+        return join(*[child.pattern for child in self.children])
+
+    def _render(self, parts: typing.List[str]):
+        for child in self.children:
+            child._write(parts)
+
+    def examples(self, cache=None) -> typing.Iterator[str]:
+        for parts in itertools.product(*[_get_examples(child, cache) for child in self.children]):
+            yield ''.join(parts)
+
+    def unrank(self, index: int) -> str:
+        return _unrank_product(self.children, index)
+
+
+class GroupNode(PatternNode):
+    """
+    (...) capturing group
+    """
+    __slots__ = ('child',)
+
+    def __init__(self, child: PatternNode):
+        self.child = child
+        self._regex = None
+        self.count = child.count or 1
+        self.length = child.length + 2
+
+    @property
+    def pattern(self) -> RegexPattern:
+        return Group(self.child.pattern)
+
+    def _render(self, parts: typing.List[str]):
+        parts.append('(')
+        self.child._write(parts)
+        parts.append(')')
+
+    def examples(self, cache=None) -> typing.Iterator[str]:
+        return iter(_get_examples(self.child, cache))
+
+    def unrank(self, index: int) -> str:
+        return self.child.unrank(index)
+
+
+class OrNode(PatternNode):
+    """
+    (?:...)|(?:...) alternatives
+    """
+    __slots__ = ('children',)
+
+    def __init__(self, children: typing.List[PatternNode]):
+        self.children = children
+        self._regex = None
+        self.count = sum(child.count or 1 for child in children)
+        # (?:...) around each alternative and | between them
+        self.length = sum(child.length + 4 for child in children) + max(len(children) - 1, 0)
+
+    @property
+    def pattern(self) -> RegexPattern:
+        return Or(*[child.pattern for child in self.children])
+
+    def _render(self, parts: typing.List[str]):
+        for i, child in enumerate(self.children):
+            parts.append('|(?:' if i else '(?:')
+            child._write(parts)
+            parts.append(')')
+
+    def examples(self, cache=None) -> typing.Iterator[str]:
+        if not self.children:
+            return iter([''])
+        return itertools.chain.from_iterable(
+            _get_examples(child, cache) for child in self.children)
+
+    def unrank(self, index: int) -> str:
+        for child in self.children:
+            if index < child.count:
+                return child.unrank(index)
+            index -= child.count
+        assert not self.children, 'index out of range'
+        return ''
+
+
+class AmountNode(PatternNode):
+    """
+    ...{i} or ...{i,j} pattern with limited repeats
+    """
+    __slots__ = ('child', 'lower', 'upper')
+
+    def __init__(self, child: PatternNode, lower: int,
+                 upper: typing.Optional[int] = None):
+        self.child = child
+        self.lower = lower
+        self.upper = upper
+        self._regex = None
+        self.count = sum(child.count ** x for x in self.amounts)
+        self.length = child.length + len(self._suffix)
+
+    @property
+    def pattern(self) -> RegexPattern:
+        return Amount(self.child.pattern, self.lower, j=self.upper, or_more=False)
+
+    def _render(self, parts: typing.List[str]):
+        self.child._write(parts)
+        parts.append(self._suffix)
+
+    @property
+    def _suffix(self) -> str:
+        if self.upper is None:
+            return f'{{{self.lower}}}'
+        return f'{{{self.lower},{self.upper}}}'
+
+    def examples(self, cache=None) -> typing.Iterator[str]:
+        for amount in self.amounts:
+            for parts in itertools.product(_get_examples(self.child, cache), repeat=amount):
+                yield ''.join(parts)
+
+    def unrank(self, index: int) -> str:
+        for amount in self.amounts:
+            block = self.child.count ** amount
+            if index < block:
+                return _unrank_product([self.child] * amount, index)
+            index -= block
+        raise IndexError('index out of range')
+
+    @property
+    def amounts(self) -> range:
+        """
+        Amounts of repeats enumerated by exrex
+        """
+        upper = self.lower if self.upper is None else self.upper
+        if upper + 1 - self.lower >= REPEAT_LIMIT:
+            return range(self.lower, self.lower + REPEAT_LIMIT)
+        return range(self.lower, upper + 1)
+
+
+class OptionalNode(PatternNode):
+    """
+    (?:...)? pattern
+    """
+    __slots__ = ('child',)
+
+    def __init__(self, child: PatternNode):
+        self.child = child
+        self._regex = None
+        self.count = 1 + (child.count or 1)
+        self.length = child.length + 5
+
+    @property
+    def pattern(self) -> RegexPattern:
+        return Optional(self.child.pattern)
+
+    def _render(self, parts: typing.List[str]):
+        parts.append('(?:')
+        self.child._write(parts)
+        parts.append(')?')
+
+    def examples(self, cache=None) -> typing.Iterator[str]:
+        yield ''
+        yield from _get_examples(self.child, cache)
+
+    def unrank(self, index: int) -> str:
+        if index == 0:
+            return ''
+        return self.child.unrank(index - 1)
+
+
+def has_empty_group(node: PatternNode) -> bool:
+    """
+    Whether the tree holds an empty concatenation or alternation,
+    e.g., `()`, which exrex fails to enumerate
+    """
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (ConcatNode, OrNode)):
+            if not node.children:
+                return True
+            stack.extend(node.children)
+        elif isinstance(node, (GroupNode, AmountNode, OptionalNode)):
+            stack.append(node.child)
+    return False
+
+
+def _get_examples(node: PatternNode, cache) -> typing.Iterable[str]:
+    """
+    Examples of a child node, taken from the cache if there is one
+    """
+    if cache is None:
+        return node.examples()
+    return cache.examples(node)
+
+
+def _unrank_product(nodes: typing.List[PatternNode], index: int) -> str:
+    """
+    Build the index-th string of the cartesian product of the nodes' examples,
+    where the first node varies the slowest
+    """
+    parts = []
+    for node in reversed(nodes):
+        index, remainder = divmod(index, node.count)
+        parts.append(node.unrank(remainder))
+    return ''.join(reversed(parts))
@@ -4,11 +4,15 @@ TODO:
 - [ ] get_random_groups
 """
 import copy
+import math
+import bisect
 import typing
 import random
+import itertools
 import string
 import deprecated
-from regexfactory.pattern import escape, join
+import numpy
+from regexfactory.pattern import escape
 from regexfactory.pattern import RegexPattern
 # TODO: [X] consider random special characters
 from regexfactory.chars import (
@@ -23,19 +27,21 @@ from regexfactory.chars import (
     # ANCHOR_START, ANCHOR_END
 )
 from regexfactory.patterns import (
-    # TODO: [X] Operators for matching single char:
-    Range,
-    Set,
-    NotSet,
-    # TODO: [X] Operators for long string
-    Group,
-    Or,
-    # TODO: [X] Work on character level (need to wrap input into Group in
-    # order to
+    # Used by the private helpers of Wrapper
     Amount,
-    Multi,
-    Optional
-    # Commet -> no effect
+    Multi
+)
+from src.alias_table import AliasTable
+from src.pattern_tree import (
+    PatternNode,
+    CharNode,
+    RangeNode,
+    SetNode,
+    ConcatNode,
+    GroupNode,
+    OrNode,
+    AmountNode,
+    OptionalNode
 )
 
 __all__ = ['PatternGenerator']
@@ -48,24 +54,73 @@ PRINTABLES.extend(string.octdigits)
 PRINTABLES.extend(string.punctuation)
 
 
+class OutOfWindow(Exception):
+    """
+    Raised when a pattern under construction already exceeds its Window
+    """
+
+
+class Window:
+    """
+    Exclusive upper bounds of the complexity and the length of a pattern
+    under construction.
+
+    Wrapping a pattern or joining it with more patterns never decreases
+    its length, nor its complexity (except for a {0} amount). Hence,
+    the construction of a pattern can be cut off as soon as one of its
+    sub-patterns reaches a bound.
+    """
+
+    def __init__(self, max_complexity: typing.Optional[int], max_length: int):
+        self.max_complexity = max_complexity
+        self.max_length = max_length
+
+    def check(self, complexity: int, length: int):
+        """
+        Raise OutOfWindow if a complexity or a length reaches the bounds
+        """
+        if length >= self.max_length or (
+                self.max_complexity is not None and complexity >= self.max_complexity):
+            raise OutOfWindow()
+
+    def check_node(self, node: PatternNode) -> PatternNode:
+        self.check(node.count, node.length)
+        return node
+
+    def without_complexity(self) -> 'Window':
+        """
+        Window bounding only the length
+        """
+        return Window(None, self.max_length)
+
+
 class Wrapper:
     """
     Warp pattern by Amount, Multi, Optional
     """
     @staticmethod
-    def wrap_into_limit_amount(pattern: RegexPattern, amount_complexity: int) -> Amount:
+    def wrap_into_limit_amount(pattern: PatternNode, amount_complexity: int) -> AmountNode:
         """
         For wraping a pattern into multiple amount pattern
         (only support limited repeativeness)
         """
+        lower_bound, upper_bound = Wrapper.get_random_limit_amount(amount_complexity)
+        return AmountNode(pattern, lower_bound, upper=upper_bound)
+
+    @staticmethod
+    def get_random_limit_amount(amount_complexity: int) -> typing.Tuple[int, typing.Optional[int]]:
+        """
+        Draw the bounds of a limited amount
+        (upper bound is None for a fix amount)
+        """
         lower_bound = random.randint(0, amount_complexity)
         if random.uniform(0, 1) < 0.5:
             # fix amount
-            return Amount(pattern, lower_bound, j=None, or_more=False)
+            return lower_bound, None
         else:
             # amount of a range
             upper_bound = lower_bound + random.randint(0, amount_complexity)
-            return Amount(pattern, lower_bound, j=upper_bound, or_more=False)
+            return lower_bound, upper_bound
 
     @staticmethod
     def __wrap_into_amount(pattern: RegexPattern,
@@ -91,21 +146,54 @@ class Wrapper:
             return Multi(pattern, match_zero=False)
 
 
+def _get_special_count_cum_weights(pair_count: int, printable_count: int) -> typing.List[typing.List[int]]:
+    """
+    For each set size, the cumulative number of conflict-free sets holding
+    0, 1, ..., pair_count special chars, i.e., C(pairs, j) * 2^j * C(printables, size - j)
+    """
+    return [
+        list(itertools.accumulate(
+            math.comb(pair_count, j) * 2 ** j * math.comb(printable_count, size - j)
+            for j in range(min(pair_count, size) + 1)))
+        for size in range(pair_count + printable_count + 1)
+    ]
+
+
 class CharGenerator:
     """
     Char-level RegexPattern Generator
+
+    With a NumPy `rng`, the random decisions of the chars of
+    a group are drawn at once instead of one call per decision.
+
+    `char_weights` maps the kinds of simple chars ('special', 'range',
+    'set' and 'printable') to their selection weights, which default to
+    the split of `special_char_prob` used without weights. The regex of
+    a special char (e.g., '\\d') or of a printable (e.g., 'a') maps
+    to its weight among the chars of its kind (1.0 by default).
+    With weights, a simple char is drawn from an alias table in O(1).
     """
     special_chars_without_any = [
-        WHITESPACE,
-        NOTWHITESPACE,
-        WORD,
-        NOTWORD,
-        DIGIT,
-        NOTDIGIT
+        CharNode(WHITESPACE.regex),
+        CharNode(NOTWHITESPACE.regex),
+        CharNode(WORD.regex),
+        CharNode(NOTWORD.regex),
+        CharNode(DIGIT.regex),
+        CharNode(NOTDIGIT.regex)
     ]
-    printable_escapes = [escape(x) for x in PRINTABLES]
-
-    def __init__(self, set_complexity: int, amount_complexity: int, special_char_prob: float = 0.5, complex_char_prob: float= 0.5):
+    any_char = CharNode(ANY.regex)
+    printable_escapes = [CharNode(escape(x).regex, (x,)) for x in PRINTABLES]
+    special_chars = special_chars_without_any + [any_char]
+    # Each special char is followed by its complement (e.g., \s and \S),
+    # which should not be selected into the same set.
+    conflicting_pairs = list(zip(special_chars_without_any[::2], special_chars_without_any[1::2]))
+    special_count_cum_weights = _get_special_count_cum_weights(
+        len(conflicting_pairs), len(printable_escapes))
+    char_kinds = ('special', 'range', 'set', 'printable')
+
+    def __init__(self, set_complexity: int, amount_complexity: int, special_char_prob: float = 0.5, complex_char_prob: float= 0.5,
+                 rng: typing.Optional[numpy.random.Generator] = None,
+                 char_weights: typing.Optional[typing.Dict[str, float]] = None):
         assert isinstance(set_complexity, int) and set_complexity > 0, 'set complexity should be > 0'
         assert isinstance(amount_complexity, int) and amount_complexity > 0, 'amount complexity should be > 0'
         assert isinstance(special_char_prob, float) and special_char_prob >= 0.0 and special_char_prob <= 1.0, 'special_char_prob should be a float in range [0, 1]'
@@ -114,18 +202,48 @@ class CharGenerator:
         self._amount_complexity = amount_complexity
         self._special_char_prob = special_char_prob
         self._complex_char_prob = complex_char_prob
+        self._rng = rng
+        if char_weights is None:
+            self._char_outcomes = None
+            self._char_table = None
+        else:
+            self._char_outcomes, weights = CharGenerator._get_char_outcomes(
+                char_weights, special_char_prob)
+            self._char_table = AliasTable(weights)
         # self._start_candidates = CharGenerator.printable_escapes
 
         # self._start_candidates.extend(
         #     CharGenerator.special_chars_without_any)
         # self._start_candidates.append(ANY)
 
-    def get_random_chars(self, length: int) -> typing.List[RegexPattern]:
+    def get_random_chars(self, length: int,
+                         window: typing.Optional[Window] = None) -> typing.List[CharNode]:
         """
         Generate a List of single char regex pattern
         with repeat select
+
+        Args:
+            - length: number of chars
+            - window: if provided, raise OutOfWindow as soon as the joined
+                chars reach the complexity or the length bound
+
+        NOTE: with a NumPy `rng`, the decisions of all chars
+        are drawn at once by `_get_batched_random_chars`.
         """
-        result = [self._get_random_char() for _ in range(length)]
+        if self._rng is None:
+            chars = (self._get_random_char() for _ in range(length))
+        else:
+            chars = self._get_batched_random_chars(length)
+        if window is None:
+            return list(chars)
+        result = []
+        complexity = 1
+        regex_length = 0
+        for char in chars:
+            complexity *= char.count
+            regex_length += char.length
+            window.check(complexity, regex_length)
+            result.append(char)
         return result
 
     def _get_random_char(self):
@@ -156,7 +274,129 @@ class CharGenerator:
         else:
             return self._get_random_simple_char()
 
-    def _get_random_amount(self) -> Amount:
+    def _get_batched_random_chars(self, length: int) -> typing.Iterator[CharNode]:
+        """
+        Same distribution as `_get_random_char`, where the uniform draws
+        of all the chars come from a single call to the NumPy generator,
+        and the integer draws are taken from the uniform draws.
+        """
+        draws = self._rng.random((length, 12 + self._set_complexity)).tolist()
+        amount_choices = self._amount_complexity + 1
+        for (complex_draw, amount_draw, special_draw, kind_draw, index_draw, start_draw,
+                stop_draw, negate_draw, lower_draw, fix_draw, upper_draw, *member_draws) in draws:
+            if self._char_table is not None:
+                kind, char = self._char_outcomes[self._char_table.sample_from(special_draw)]
+            elif special_draw < self._special_char_prob:
+                if kind_draw <= 0.333:
+                    kind, char = 'special', CharGenerator.special_chars[
+                        int(index_draw * len(CharGenerator.special_chars))]
+                elif kind_draw <= 0.666:
+                    kind = 'range'
+                else:
+                    kind = 'set'
+            else:
+                kind, char = 'printable', CharGenerator.printable_escapes[
+                    int(index_draw * len(CharGenerator.printable_escapes))]
+            if kind == 'range':
+                start = string.printable[int(start_draw * len(string.printable))]
+                stop = string.printable[int(stop_draw * len(string.printable))]
+                if ord(start) <= ord(stop):
+                    char = RangeNode(start, stop)
+                else:
+                    char = RangeNode(stop, start)
+            elif kind == 'set':
+                count = 1 + int(index_draw * self._set_complexity)
+                char = SetNode(self._get_batched_non_repeating_chars(member_draws[:count + 1]),
+                               negate=negate_draw >= 0.5)
+            if complex_draw < self._complex_char_prob and amount_draw < 0.5:
+                lower_bound = int(lower_draw * amount_choices)
+                if fix_draw < 0.5:
+                    char = AmountNode(char, lower_bound)
+                else:
+                    char = AmountNode(char, lower_bound,
+                                      upper=lower_bound + int(upper_draw * amount_choices))
+            yield char
+
+    @staticmethod
+    def _get_batched_non_repeating_chars(draws: typing.List[float]) -> typing.List[CharNode]:
+        """
+        `__get_random_non_repeating_chars` taken from uniform draws:
+        one for the number of special chars and one per char
+        """
+        count = len(draws) - 1
+        if count >= len(CharGenerator.special_count_cum_weights):
+            return sorted(CharGenerator.printable_escapes, key=lambda x: x.regex)
+        cum_weights = CharGenerator.special_count_cum_weights[count]
+        special_count = bisect.bisect(cum_weights, int(draws[0] * cum_weights[-1]))
+        # Picking one of the special chars left and dropping its complement
+        # keeps the specials uniform over the conflict-free ones.
+        pairs = list(CharGenerator.conflicting_pairs)
+        result = []
+        for i, x in enumerate(draws[1:special_count + 1]):
+            choice = int(x * 2 * (len(pairs) - i))
+            j = i + choice // 2
+            pairs[i], pairs[j] = pairs[j], pairs[i]
+            result.append(pairs[i][choice % 2])
+        printable_indices = CharGenerator._get_distinct_indices(
+            len(CharGenerator.printable_escapes), draws[special_count + 1:])
+        result.extend(CharGenerator.printable_escapes[i] for i in printable_indices)
+        return sorted(result, key=lambda x: x.regex)
+
+    @staticmethod
+    def _get_distinct_indices(n: int, draws: typing.List[float]) -> typing.List[int]:
+        """
+        Distinct indices of range(n), one per uniform draw
+        (the first steps of a Fisher-Yates shuffle)
+        """
+        swapped = {}
+        result = []
+        for i, x in enumerate(draws):
+            j = i + int(x * (n - i))
+            result.append(swapped.get(j, j))
+            swapped[j] = swapped.get(i, i)
+        return result
+
+    @staticmethod
+    def _get_char_outcomes(char_weights: typing.Dict[str, float], special_char_prob: float) -> typing.Tuple[
+            typing.List[typing.Tuple[str, typing.Optional[CharNode]]], typing.List[float]]:
+        """
+        Flatten the weights of the kinds and of the chars into
+        (kind, char) outcomes and their probabilities, where the
+        char is None for the kinds built at random (range and set)
+        """
+        kind_weights = {
+            'special': special_char_prob * 0.333,
+            'range': special_char_prob * 0.333,
+            'set': special_char_prob * 0.334,
+            'printable': 1. - special_char_prob
+        }
+        kind_chars = {
+            'special': CharGenerator.special_chars,
+            'printable': CharGenerator.printable_escapes
+        }
+        char_regexes = {char.regex for chars in kind_chars.values() for char in chars}
+        for key, weight in char_weights.items():
+            assert key in kind_weights or key in char_regexes, f'unknown char kind or char: {key!r}'
+            assert weight >= 0, f'weight of {key!r} should be >= 0'
+            if key in kind_weights:
+                kind_weights[key] = weight
+        outcomes = []
+        weights = []
+        for kind in CharGenerator.char_kinds:
+            if kind not in kind_chars:
+                outcomes.append((kind, None))
+                weights.append(kind_weights[kind])
+                continue
+            chars = kind_chars[kind]
+            weights_in_kind = [char_weights.get(char.regex, 1.) for char in chars]
+            total = sum(weights_in_kind)
+            assert total > 0 or kind_weights[kind] == 0, f'all chars of {kind!r} have zero weights'
+            for char, weight in zip(chars, weights_in_kind):
+                outcomes.append((kind, char))
+                weights.append(kind_weights[kind] * weight / total if total else 0.)
+        return outcomes, weights
+
+    def _get_random_amount(self) -> AmountNode:
         """
         warp _get_random_simple_char into Amount
         """
@@ -165,7 +405,7 @@ class CharGenerator:
             char, self._amount_complexity)
         return amount_char
 
-    def _get_random_simple_char(self) -> RegexPattern:
+    def _get_random_simple_char(self) -> CharNode:
         """
         select by special char probability
 
@@ -177,7 +417,17 @@ class CharGenerator:
             special char -> more complicated
         else:
             printable char
+
+        NOTE: with `char_weights`, the kind and the char
+        are drawn at once from the alias table.
         """
+        if self._char_table is not None:
+            kind, char = self._char_outcomes[self._char_table.sample()]
+            if kind == 'range':
+                return CharGenerator._get_random_range()
+            if kind == 'set':
+                return self._get_random_set()
+            return char
         if random.uniform(0, 1) < self._special_char_prob:
             p = random.uniform(0, 1)
             if p <= 0.333:
@@ -190,59 +440,57 @@ class CharGenerator:
             return CharGenerator._get_random_printables()
 
     @staticmethod
-    def _get_random_plain_special_char() -> RegexPattern:
-        return random.choice(CharGenerator.special_chars_without_any + [ANY])
+    def _get_random_plain_special_char() -> CharNode:
+        return random.choice(CharGenerator.special_chars_without_any + [CharGenerator.any_char])
 
     @staticmethod
-    def _get_random_range() -> Range:
+    def _get_random_range() -> RangeNode:
         """
         Generate a random regex Range pattern
         [s-e], where s and e are some printable chars
         """
         chars = random.choices(string.printable, k=2)
         if ord(chars[0]) <= ord(chars[1]):
-            return Range(escape(chars[0]), escape(chars[1]))
+            return RangeNode(chars[0], chars[1])
         else:
-            return Range(escape(chars[1]), escape(chars[0]))
+            return RangeNode(chars[1], chars[0])
 
-    def _get_random_set(self) -> typing.Union[Set, NotSet]:
+    def _get_random_set(self) -> SetNode:
         """
         Generate a random Set/NotSet pattern.
         NOTE that Any (.) is not a special character in set. Hence, it is excluded.
         """
         count = random.randint(1, self._set_complexity)
         chars = CharGenerator.__get_random_non_repeating_chars(count)
-        pattern = join(*chars)
         if random.uniform(0, 1) < 0.5:
-            return Set(pattern)
+            return SetNode(chars)
         else:
-            return NotSet(pattern)
+            return SetNode(chars, negate=True)
 
     @staticmethod
     def __get_random_non_repeating_chars(
-            count: int) -> typing.List[RegexPattern]:
+            count: int) -> typing.List[CharNode]:
         """
         Generate a list of single char regex pattern
         without repeat select
+
+        The sets are uniform over those without a special char and its
+        complement: the number of special chars is drawn by the number of
+        such sets holding it, then the special chars and the printables.
         """
-        candidates = CharGenerator.special_chars_without_any + CharGenerator.printable_escapes
-        try:
-            result = random.sample(candidates, count)
-        except ValueError:
+        if count >= len(CharGenerator.special_count_cum_weights):
             result = CharGenerator.printable_escapes
-        while (
-            (WHITESPACE in result) and (NOTWHITESPACE in result)
-        ) or (
-            (WORD in result) and (NOTWORD in result)
-        ) or (
-            (DIGIT in result) and (NOTDIGIT in result)
-        ):
-            result = random.sample(candidates, count)
+        else:
+            cum_weights = CharGenerator.special_count_cum_weights[count]
+            special_count = bisect.bisect(cum_weights, random.random() * cum_weights[-1])
+            result = random.sample(CharGenerator.printable_escapes, count - special_count)
+            if special_count:
+                result.extend(random.choice(pair) for pair in random.sample(CharGenerator.conflicting_pairs, special_count))
         result = sorted(result, key=lambda x: x.regex)
         return result
 
     @ staticmethod
-    def _get_random_printables() -> RegexPattern:
+    def _get_random_printables() -> CharNode:
         return random.choice(CharGenerator.printable_escapes)
 
 
@@ -260,7 +508,9 @@ class PatternGenerator:
 
     def __init__(self, set_complexity: int, union_complexity: int, amount_complexity: int,
                  group_complexity: int, depth_complexity: int, breadth_complexity: int,
-                 special_char_prob: float = 0.5, complex_char_prob: float= 0.5, complex_group_prob: float=0.5):
+                 special_char_prob: float = 0.5, complex_char_prob: float= 0.5, complex_group_prob: float=0.5,
+                 rng: typing.Optional[numpy.random.Generator] = None,
+                 char_weights: typing.Optional[typing.Dict[str, float]] = None):
         assert breadth_complexity >= 1, 'breadth complexity should be larger than 1'
         assert set_complexity >= 1, 'set complexity should be larger than 1'
         assert isinstance(complex_group_prob, float) and complex_group_prob >= 0.0 and complex_group_prob <= 1.0, 'complex_group_prob should be a float in range [0, 1]'
@@ -275,66 +525,144 @@ class PatternGenerator:
             set_complexity,
             amount_complexity,
             special_char_prob=special_char_prob,
-            complex_char_prob=complex_char_prob
+            complex_char_prob=complex_char_prob,
+            rng=rng,
+            char_weights=char_weights
         )
 
     def get_random_pattern(self, recurse: int = 0) -> RegexPattern:
         """
         Generate random pattern
         """
+        return self.get_random_tree(recurse=recurse).pattern
+
+    def get_random_tree(self, recurse: int = 0,
+                        window: typing.Optional[Window] = None) -> ConcatNode:
+        """
+        Generate random pattern as a pattern tree,
+        which carries the complexity of the pattern
+
+        Args:
+            - recurse: current depth of the pattern
+            - window: if provided, raise OutOfWindow as soon as the pattern
+                is known to reach the complexity or the length bound
+        """
         group_count = random.randint(1, self._breadth_complexity)
-        groups = self.get_random_groups(group_count, recurse=recurse)
-        pattern = join(*groups)
-        return pattern
+        groups = self.get_random_groups(group_count, recurse=recurse, window=window)
+        if window is None:
+            return ConcatNode(groups)
+        return window.check_node(ConcatNode(groups))
+
+    def get_random_tree_in_window(self, complexity_window: typing.Tuple[int, int],
+                                  length_window: typing.Tuple[int, int]) -> ConcatNode:
+        """
+        Generate a random pattern tree whose complexity and length are in
+        the half-open windows [lower, upper).
 
-    def get_random_groups(self, group_count: int,
-                          recurse: int = 0) -> typing.List[Group]:
+        Sub-patterns reaching an upper bound are cut off while they are built,
+        so only patterns below the lower bounds are rejected after the fact.
+        The output follows the distribution of `get_random_tree` filtered by
+        the windows.
+        """
+        min_complexity, max_complexity = complexity_window
+        min_length, max_length = length_window
+        window = Window(max_complexity, max_length)
+        while True:
+            try:
+                tree = self.get_random_tree(window=window)
+            except OutOfWindow:
+                continue
+            if tree.count >= min_complexity and tree.length >= min_length:
+                return tree
+
+    def get_random_groups(self, group_count: int, recurse: int = 0,
+                          window: typing.Optional[Window] = None) -> typing.List[GroupNode]:
         """
         Generate random group pattern that includes Or/Amount/Multi/Optional patterns
+
+        The candidates come in rounds of four: a plain group, an Or-wrapped
+        group, and the plain group wrapped by a limited Amount or by Optional.
+        The `group_count` groups are selected from ceil(group_count / 4) rounds
+        with the weights of the four kinds. The round and the kind of each
+        selected group are drawn first, so that only the selected candidates
+        are built. With a window, the construction stops at the first selected
+        candidate reaching it.
         """
-        candidates = []
-        weights = []
-        while len(candidates) < group_count:
-            group = self._get_random_group_pattern(recurse=recurse)
-            candidates.append(group)
-            weights.append(1. - self._complex_group_prob)
-            # 1) Or-wrapped groups
-            candidates.append(self._get_random_union_groups(recurse=recurse))
-            # 2) Limited-Amount-wrapped groups
-            candidates.append(
-                Group(
-                    Wrapper.wrap_into_limit_amount(
-                        group,
-                        self._amount_complexity)))
-            # candidates.append(Group(Wrapper.wrap_into_multi(group)))
-            # 3) Optional-wrapped groups
-            candidates.append(Group(Optional(group)))
-            weights.extend([self._complex_group_prob / 3.] * 3)
-        return random.choices(candidates, k=group_count, weights=tuple(weights))
-
-    def _get_random_union_groups(self, recurse: int = 0) -> Group:
+        round_count = (group_count + 3) // 4
+        kinds = random.choices(
+            range(4), k=group_count,
+            weights=(1. - self._complex_group_prob,) + (self._complex_group_prob / 3.,) * 3)
+        rounds = [random.randrange(round_count) for _ in range(group_count)]
+        amounts = {
+            i: Wrapper.get_random_limit_amount(self._amount_complexity)
+            for i, kind in zip(rounds, kinds) if kind == 2
+        }
+        if window is not None:
+            # Complexity of a {0} amount does not depend on its group, so such
+            # a group is bounded by length only unless it is used elsewhere.
+            complexity_free = {
+                i for i, (lower_bound, upper_bound) in amounts.items()
+                if (lower_bound if upper_bound is None else upper_bound) == 0
+            } - {i for i, kind in zip(rounds, kinds) if kind in (0, 3)}
+        plain_groups = {}
+        union_groups = {}
+        groups = []
+        complexity = 1
+        length = 0
+        for i, kind in zip(rounds, kinds):
+            if kind == 1:
+                # 1) Or-wrapped groups
+                if i not in union_groups:
+                    union_groups[i] = self._get_random_union_groups(
+                        recurse=recurse, window=window)
+                group = union_groups[i]
+            else:
+                if i not in plain_groups:
+                    group_window = window
+                    if window is not None and i in complexity_free:
+                        group_window = window.without_complexity()
+                    plain_groups[i] = self._get_random_group_pattern(
+                        recurse=recurse, window=group_window)
+                group = plain_groups[i]
+                if kind == 2:
+                    # 2) Limited-Amount-wrapped groups
+                    lower_bound, upper_bound = amounts[i]
+                    group = GroupNode(AmountNode(group, lower_bound, upper=upper_bound))
+                elif kind == 3:
+                    # 3) Optional-wrapped groups
+                    group = GroupNode(OptionalNode(group))
+            if window is not None:
+                complexity *= group.count
+                length += group.length
+                window.check(complexity, length)
+            groups.append(group)
+        return groups
+
+    def _get_random_union_groups(self, recurse: int = 0,
+                                 window: typing.Optional[Window] = None) -> GroupNode:
         """
         Get random Or-wrapped group patterns
         """
         group_count = random.randint(0, self._union_complexity)
-        groups = self._get_random_groups(group_count, recurse=recurse)
-        return Group(Or(*groups))
+        groups = self._get_random_groups(group_count, recurse=recurse, window=window)
+        return GroupNode(OrNode(groups))
 
-    def _get_random_groups(self, group_count: int,
-                           recurse: int = 0) -> typing.List[Group]:
+    def _get_random_groups(self, group_count: int, recurse: int = 0,
+                           window: typing.Optional[Window] = None) -> typing.List[GroupNode]:
         groups = []
         for _ in range(group_count):
-            group = self._get_random_group_pattern(recurse=recurse)
+            group = self._get_random_group_pattern(recurse=recurse, window=window)
             groups.append(group)
         return groups
 
-    def _get_random_group_pattern(self, recurse: int = 0) -> Group:
+    def _get_random_group_pattern(self, recurse: int = 0,
+                                  window: typing.Optional[Window] = None) -> GroupNode:
         """
         A string mixing normal chars with special chars
         """
         if recurse > self._depth_complexity:
             length = random.randint(0, self._group_complexity)
-            return Group(
-                join(*self.__char_generator.get_random_chars(length)))
+            return GroupNode(
+                ConcatNode(self.__char_generator.get_random_chars(length, window=window)))
         else:
-            return Group(self.get_random_pattern(recurse=recurse + 1))
+            return GroupNode(self.get_random_tree(recurse=recurse + 1, window=window))
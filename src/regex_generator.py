@@ -5,20 +5,47 @@ NOTE:
 regex for fullmatching is simpler than that for search or match
 
 TODO:
-- [X] use cuckoo filter to ignore repeat regex
+- [X] use bloom filter to ignore repeat regex (scaled by memory budget)
 - [X] generate multiple examples with length > 0
-- [ ] add selection weight to different kind of special character
-- [ ] speed up the generation using multi-processing
+- [X] add selection weight to different kind of special character
+- [X] speed up the generation using multi-processing
 
 REF:
 https://regex-generator.olafneumann.org/
 """
 import exrex
-import re
+import time
+import queue
+import typing
+import itertools
+import functools
+import collections
+import random
+import multiprocessing
+import numpy
 from toolz import curried
+from toolz.itertoolz import partition_all
 from toolz.functoolz import pipe
-from rbloom import Bloom
+from src.dedupe import ScalableBloom, stable_hash
+from src.checkpoint import Checkpointer
+from src.shared_batches import SharedBatchRing
+from src.compile_cache import CompileCache
+from src.corpus_writer import FIELDS
+from src.example_cache import ExampleCache
+from src.stage_stats import StageStats
+from src.canonical import canonicalize
+from src.auto_tuner import AutoTuner
+from src.match_cost import MatchCostProfiler
+from src.negative_examples import NegativeExampleGenerator
 from src.random_pattern import PatternGenerator
+from src.pattern_tree import has_empty_group
+
+# Reasons of rejecting a regex while enumerating its examples
+REJECT_ENUMERATION_ERROR = 'enumeration_error'
+REJECT_NON_STRING_EXAMPLE = 'non_string_example'
+REJECT_MISMATCH = 'mismatch'
+REJECT_COUNT_MISMATCH = 'count_mismatch'
+REJECT_EMPTY_GROUP = 'empty_group'
 
 
 class RegexGenerator:
@@ -27,13 +54,148 @@ class RegexGenerator:
     its complexity, length, and examples
     """
 
-    def __init__(self, max_complexity=1000, max_length=20):
+    def __init__(self, max_complexity=1000, max_length=20, seed=None,
+                 dedupe_max_bytes=64 * 2 ** 20, dedupe_error_rate=0.01,
+                 targeted_sampling=False, compile_cache_size=4096,
+                 max_examples=None, native_examples=True, example_samples=None,
+                 example_cache_size=None, stats_path=None, stats_interval=60.0,
+                 batched_chars=False, char_weights=None, canonical_dedupe=True,
+                 checkpoint_path=None, checkpoint_interval=300.0, resume=False,
+                 tune_bounds=None, tune_epoch=50,
+                 match_cost=False, match_cost_cap=0.05, match_cost_buckets=None,
+                 negative_examples=None):
         self._max_complexity = max_complexity
         self._max_length = max_length
-        self._pattern_generator = PatternGenerator(
-            **self.initial_complexities
+        self._targeted_sampling = targeted_sampling
+        self._dedupe_max_bytes = dedupe_max_bytes
+        self._dedupe_error_rate = dedupe_error_rate
+        self._compile_cache = CompileCache(maxsize=compile_cache_size)
+        self._max_examples = max_examples
+        self._native_examples = native_examples
+        assert example_samples is None or native_examples, 'example sampling requires native examples'
+        self._example_samples = example_samples
+        if example_cache_size is None:
+            self._example_cache = None
+        else:
+            assert native_examples, 'example cache requires native examples'
+            self._example_cache = ExampleCache(maxsize=example_cache_size)
+        self._rejections = collections.Counter()
+        self._stage_stats = StageStats()
+        self._accepted_stage = 'filter_repeat'
+        self._stats_path = stats_path
+        self._stats_interval = stats_interval
+        self._seed = seed
+        if seed is not None:
+            random.seed(seed)
+        self._batched_chars = batched_chars
+        self._char_weights = char_weights
+        self._canonical_dedupe = canonical_dedupe
+        self._rng = numpy.random.default_rng(seed) if batched_chars else None
+        self._pattern_generator = self._get_pattern_generator(self.initial_complexities)
+        self._candidates = 0
+        self._tune_bounds = tune_bounds
+        self._tune_epoch = tune_epoch
+        if tune_bounds is None:
+            self._tuner = None
+        else:
+            self._tuner = AutoTuner(self.initial_complexities, tune_bounds,
+                                    epoch_accepted=tune_epoch, seed=seed)
+        self._bloom = ScalableBloom(
+            max_bytes=dedupe_max_bytes,
+            error_rate=dedupe_error_rate,
+            # Saving the filter needs a hash that is the same in the resumed process
+            hash_func=None if checkpoint_path is None else stable_hash
         )
-        self._bloom = Bloom(100000000000, 0.01)
+        self._negative_examples = negative_examples
+        self._negative_generator = None if negative_examples is None else \
+            NegativeExampleGenerator(negative_examples)
+        self._match_cost = match_cost
+        self._match_cost_cap = match_cost_cap
+        assert match_cost_buckets is None or match_cost, 'match_cost_buckets requires match_cost'
+        self._match_cost_buckets = match_cost_buckets
+        self._offset = 0
+        self._resumed = False
+        self._checkpoint_interval = checkpoint_interval
+        self._checkpointer = None if checkpoint_path is None else Checkpointer(checkpoint_path)
+        if resume:
+            assert self._checkpointer is not None, 'resume requires checkpoint_path'
+            if self._checkpointer.exists():
+                self._restore_checkpoint(self._checkpointer.load())
+
+    @property
+    def offset(self) -> int:
+        """
+        Number of results generated so far, including those
+        generated before resuming from a checkpoint
+        """
+        return self._offset
+
+    @property
+    def resumed(self) -> bool:
+        """
+        Whether the state was restored from a checkpoint
+        (False with `resume=True` if there was no checkpoint yet)
+        """
+        return self._resumed
+
+    @property
+    def dedupe_fill_ratio(self) -> float:
+        """
+        Fill ratio of the repeat filter (see `dedupe_evicted` once
+        its memory budget is used up)
+        """
+        return self._bloom.fill_ratio
+
+    @property
+    def dedupe_evicted(self) -> int:
+        """
+        Number of regex forgotten by the repeat filter to stay
+        within its memory budget, whose repeats are not dropped
+        """
+        return self._bloom.evicted_items
+
+    @property
+    def compile_cache_stats(self) -> dict:
+        """
+        Hit/miss counters of the compiled regex cache
+        """
+        return self._compile_cache.stats
+
+    @property
+    def example_cache_stats(self) -> typing.Optional[dict]:
+        """
+        Hit rate and memory use of the sub-pattern example cache
+        (None if it is disabled)
+        """
+        if self._example_cache is None:
+            return None
+        return self._example_cache.stats
+
+    @property
+    def stage_stats(self) -> dict:
+        """
+        Items in, items out, cumulative wall time and rejection rate
+        of each stage of `generate` (including worker processes)
+        """
+        return self._stage_stats.report(accepted_stage=self._accepted_stage)
+
+    @property
+    def reject_stats(self) -> dict:
+        """
+        Number of regex rejected by each reason during example enumeration
+        """
+        return dict(self._rejections)
+
+    @property
+    def tune_stats(self) -> typing.Optional[dict]:
+        """
+        Tuned parameters, accepted results per CPU-second and drift of the
+        output distribution (see `src.auto_tuner`) of this process
+        (None if tuning is disabled)
+        """
+        if self._tuner is None:
+            return None
+        return self._tuner.report
 
     @property
     def initial_complexities(self) -> dict:
@@ -53,119 +215,601 @@ class RegexGenerator:
             'complex_group_prob': 0.5
         }
 
-    def generate(self):
+    def generate(self, workers: int = 1, batch_size: int = 16):
         """
         Generating non-repeating complexity-in-ranged random regex,
         as well as its complexity, length, and examples
+
+        Args:
+            - workers: number of worker processes. With workers > 1,
+                each worker runs its own pattern generator seeded
+                with `seed + worker index`, and the streams are merged
+                and de-duplicated in the calling process. The workers
+                only send the fields of the corpus (`FIELDS`), so the
+                merged results carry no `tree`, and their `compiled`
+                regex is only compiled once it is asked for.
+            - batch_size: number of results a worker sends at once
+
+        NOTE: the counters of each stage are available from `stage_stats`,
+        and are dumped as JSON to `stats_path` every `stats_interval` seconds
+        if `stats_path` is provided.
+
+        NOTE: with `canonical_dedupe`, the regex are de-duplicated by their
+        canonical form (see `src.canonical`) before `_validity_filter`, so
+        that no examples are enumerated for the repeats. Only the canonical
+        forms of the valid regex are remembered, so that an invalid regex,
+        e.g., `()`, does not shadow a valid one of the same canonical form,
+        e.g., `(a{0})`.
+
+        NOTE: with `negative_examples`, up to that many near misses that
+        the regex does not fullmatch are added as `negative_examples`
+        (see `src.negative_examples`).
+
+        NOTE: with `match_cost`, the cost of fullmatching each regex with
+        `re` against its examples and near misses is added as `match_cost`
+        (see `src.match_cost`), taking at most `match_cost_cap` seconds
+        per regex, and only the regex whose cost bucket is in the
+        inclusive range `match_cost_buckets` are kept if it is provided.
+
+        NOTE: with `tune_bounds`, the parameters of the pattern generator
+        are tuned within their bounds to maximize the accepted results per
+        CPU-second (by each worker process with workers > 1). The switches
+        of the parameters depend on the measured CPU time, so the results
+        are no longer reproducible from the seed.
+
+        NOTE: with `checkpoint_path`, a checkpoint is saved every
+        `checkpoint_interval` seconds when the next result is asked for
+        (see `save_checkpoint`), or only by calling `save_checkpoint`
+        if `checkpoint_interval` is None.
         """
+        assert isinstance(workers, int) and workers >= 1, 'workers should be >= 1'
+        assert workers == 1 or self._checkpointer is None, 'checkpoints are not supported with workers > 1'
+        if workers > 1:
+            self._accepted_stage = 'filter_repeat_shards'
+            return pipe(
+                self._sharded_producer(workers, batch_size),
+                lambda x: self._filter_repeat(
+                    x, stage=self._accepted_stage,
+                    key='canonical' if self._canonical_dedupe else 'regex'),
+                self._dump_stats,
+                self._checkpoint,
+            )
+        if self._canonical_dedupe:
+            self._accepted_stage = 'validity_filter.examples_valid'
+            return pipe(
+                self._stage_stats.iterate('regex_producer', self.regex_producer()),
+                self._complexity_filter,
+                curried.map(self._stage_stats.map('add_canonical', self._add_canonical)),
+                lambda x: self._filter_repeat(x, stage='filter_canonical_repeat', key='canonical', add=False),
+                self._validity_filter,
+                curried.map(lambda x: self._add_repeat_key(x, 'canonical')),
+                curried.map(self._stage_stats.map('add_negative_examples', self._add_negative_examples)),
+                self._match_cost_filter,
+                self._tune,
+                self._dump_stats,
+                self._checkpoint,
+            )
+        self._accepted_stage = 'filter_repeat'
         return pipe(
-            self.regex_producer(),
+            self._stage_stats.iterate('regex_producer', self.regex_producer()),
             self._complexity_filter,
             self._validity_filter,
             self._filter_repeat,
+            curried.map(self._stage_stats.map('add_negative_examples', self._add_negative_examples)),
+            self._match_cost_filter,
+            self._tune,
+            self._dump_stats,
+            self._checkpoint,
+        )
+
+    def save_checkpoint(self):
+        """
+        Save the state after the results generated so far (`offset`)
+        in the background, assuming the caller has handled all of them.
+        Resuming from the checkpoint with `resume=True` continues with
+        the results that would have followed them.
+        """
+        assert self._checkpointer is not None, 'checkpoint_path is not provided'
+        self._checkpointer.save({
+            'config': self._worker_kwargs(self._seed),
+            'offset': self._offset,
+            'random_state': random.getstate(),
+            'rng_state': None if self._rng is None else self._rng.bit_generator.state,
+            'bloom': self._bloom.copy(),
+            'stage_counters': self._stage_stats.counters,
+            'rejections': dict(self._rejections),
+            'tuner': None if self._tuner is None else self._tuner.copy()
+        })
+
+    def _restore_checkpoint(self, state: dict):
+        assert state['config'] == self._worker_kwargs(self._seed), \
+            'checkpoint was saved by a generator with other arguments'
+        self._offset = state['offset']
+        self._resumed = True
+        random.setstate(state['random_state'])
+        if self._rng is not None:
+            self._rng.bit_generator.state = state['rng_state']
+        self._bloom = state['bloom']
+        self._stage_stats.restore(state['stage_counters'])
+        self._rejections.update(state['rejections'])
+        if self._tuner is not None:
+            self._tuner = state['tuner']
+            self._pattern_generator = self._get_pattern_generator(self._tuner.params)
+
+    def _get_pattern_generator(self, complexities: dict) -> PatternGenerator:
+        return PatternGenerator(
+            **complexities,
+            rng=self._rng,
+            char_weights=self._char_weights
         )
 
+    def _add_negative_examples(self, result: dict) -> dict:
+        """
+        Add the near-miss negative examples
+        """
+        if self._negative_generator is not None:
+            result['negative_examples'] = self._negative_generator.generate(
+                result['tree'], result['compiled'], result['examples'])
+        return result
+
+    def _match_cost_filter(self, iterable):
+        """
+        Add the match cost of the regex, and filter the regex by its bucket
+        """
+        if not self._match_cost:
+            yield from iterable
+            return
+        if self._match_cost_buckets is not None:
+            self._accepted_stage = 'match_cost.buckets'
+        lower, upper = self._match_cost_buckets or (None, None)
+        profiler = MatchCostProfiler(time_cap=self._match_cost_cap, seed=self._seed)
+        for x in iterable:
+            start = time.perf_counter()
+            x['match_cost'] = profiler.profile(
+                x['compiled'], x['examples'], near_misses=x.get('negative_examples'))
+            self._stage_stats.record('match_cost.profile', 1, 1, time.perf_counter() - start)
+            if lower is not None:
+                kept = lower <= x['match_cost']['bucket'] <= upper
+                self._stage_stats.record('match_cost.buckets', 1, int(kept), 0.)
+                if not kept:
+                    continue
+            yield x
+
+    def _tune(self, iterable):
+        """
+        Feed the tuner with the accepted results, the candidate patterns
+        and the CPU time behind each of them, and switch the parameters
+        of the pattern generator when the tuner asks for it
+        """
+        if self._tuner is None:
+            yield from iterable
+            return
+        iterator = iter(iterable)
+        while True:
+            candidates = self._candidates
+            start = time.process_time()
+            try:
+                x = next(iterator)
+            except StopIteration:
+                return
+            params = self._tuner.record(x, self._candidates - candidates, time.process_time() - start)
+            if params is not None:
+                self._pattern_generator = self._get_pattern_generator(params)
+            yield x
+
+    def _checkpoint(self, iterable):
+        """
+        Count the generated results and periodically save a checkpoint
+        once the caller has handled a result and asks for the next one
+        """
+        last_save = time.monotonic()
+        try:
+            for x in iterable:
+                self._offset += 1
+                yield x
+                if self._checkpointer is not None and self._checkpoint_interval is not None and \
+                        time.monotonic() - last_save >= self._checkpoint_interval:
+                    self.save_checkpoint()
+                    last_save = time.monotonic()
+        finally:
+            if self._checkpointer is not None:
+                self._checkpointer.wait()
+
+    def feed(self, ring: SharedBatchRing, workers: int = 1, max_records: typing.Optional[int] = None):
+        """
+        Pack the generated results into the shared batches of the ring
+        for consumer processes to read in place (see `src.shared_batches`),
+        until `max_records` results are fed or the caller is interrupted,
+        then mark the end of the batches
+
+        Args:
+            - ring: ring of shared batches created by the calling process
+            - workers: number of worker processes. With workers > 1, the
+                workers pack their results into the ring themselves, and
+                only the repeats across workers are dropped here, by
+                clearing their `keep` flag.
+            - max_records: number of results to feed (None for no limit)
+        """
+        assert isinstance(workers, int) and workers >= 1, 'workers should be >= 1'
+        try:
+            if workers == 1:
+                for slot in ring.pack(itertools.islice(self.generate(), max_records)):
+                    ring.publish(slot)
+            else:
+                self._feed_shards(ring, workers, max_records)
+        finally:
+            ring.finish()
+
+    def _feed_shards(self, ring: SharedBatchRing, workers: int, max_records: typing.Optional[int]):
+        """
+        Start the worker processes, and publish their staged batches
+        without the regex repeated across workers
+        """
+        assert self._checkpointer is None, 'checkpoints are not supported with workers > 1'
+        self._accepted_stage = 'filter_repeat_shards'
+        key_index = 1 if self._canonical_dedupe else 0
+        fed = 0
+        processes = self._start_shards(workers, _feed_shard, ring)
+        try:
+            while max_records is None or fed < max_records:
+                try:
+                    shard, batch, counters = ring.get_staged(timeout=1.0)
+                except queue.Empty:
+                    if not any(process.is_alive() for process in processes):
+                        raise RuntimeError('all generation workers exited')
+                    continue
+                self._stage_stats.merge_shard(shard, counters)
+                start = time.perf_counter()
+                for i in range(len(batch.keep)):
+                    key = batch.string(batch.record_starts[i] + key_index)
+                    if fed == max_records or key in self._bloom:
+                        batch.keep[i] = 0
+                    else:
+                        self._bloom.add(key)
+                        fed += 1
+                kept = len(batch)
+                self._stage_stats.record(
+                    self._accepted_stage, len(batch.keep), kept, time.perf_counter() - start)
+                self._offset += kept
+                if kept:
+                    ring.publish(batch.slot)
+                else:
+                    batch.release()
+        finally:
+            self._stop_shards(processes)
+
+    def _start_shards(self, workers: int, target: typing.Callable, output) -> typing.List[multiprocessing.Process]:
+        """
+        Start the worker processes, each seeded with `seed + worker index`,
+        running `target(output, shard, generator class, generator kwargs, ...)`
+        """
+        base_seed = self._seed if self._seed is not None else random.randrange(2 ** 32)
+        processes = [
+            multiprocessing.Process(
+                target=target,
+                args=(output, i, self.__class__, self._worker_kwargs(base_seed + i)),
+                daemon=True
+            ) for i in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        return processes
+
+    @staticmethod
+    def _stop_shards(processes: typing.List[multiprocessing.Process]):
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+    def _sharded_producer(self, workers: int, batch_size: int):
+        """
+        Lazily start the worker processes and merge their outputs
+        """
+        results = multiprocessing.Queue(maxsize=workers * 4)
+        processes = self._start_shards(workers, functools.partial(_generate_shard, batch_size=batch_size), results)
+        try:
+            while True:
+                try:
+                    shard, batch, counters = results.get(timeout=1.0)
+                except queue.Empty:
+                    if not any(process.is_alive() for process in processes):
+                        raise RuntimeError('all generation workers exited')
+                    continue
+                self._stage_stats.merge_shard(shard, counters)
+                for fields in batch:
+                    yield _ShardResult(fields, self._compile_cache.compile)
+        finally:
+            self._stop_shards(processes)
+            results.close()
+
+    def _worker_kwargs(self, seed: int) -> dict:
+        """
+        Keyword arguments for building the generator of a worker process
+        """
+        return {
+            'max_complexity': self._max_complexity,
+            'max_length': self._max_length,
+            'seed': seed,
+            'dedupe_max_bytes': self._dedupe_max_bytes,
+            'dedupe_error_rate': self._dedupe_error_rate,
+            'targeted_sampling': self._targeted_sampling,
+            'compile_cache_size': self._compile_cache.stats['maxsize'],
+            'max_examples': self._max_examples,
+            'native_examples': self._native_examples,
+            'example_samples': self._example_samples,
+            'example_cache_size': None if self._example_cache is None else self._example_cache.stats['maxsize'],
+            'batched_chars': self._batched_chars,
+            'char_weights': self._char_weights,
+            'canonical_dedupe': self._canonical_dedupe,
+            'tune_bounds': self._tune_bounds,
+            'tune_epoch': self._tune_epoch,
+            'negative_examples': self._negative_examples,
+            'match_cost': self._match_cost,
+            'match_cost_cap': self._match_cost_cap,
+            'match_cost_buckets': self._match_cost_buckets
+        }
+
     def regex_producer(self):
         """
-        Generate regex and its complexity and length
+        Generate pattern tree and its complexity and length
+
+        NOTE: the complexity and the length are counted by the pattern tree
+        while it is built, where the complexity equals `exrex.count(regex)`.
+        The regex string is only rendered by `_validity_filter`.
         """
         return pipe(self._regex_producer(),
-                    curried.map(lambda rp: {
-                        'regex': rp.regex,
-                        'complexity': exrex.count(rp.regex),
-                        'length': len(rp.regex)
+                    curried.map(lambda tree: {
+                        'tree': tree,
+                        'complexity': tree.count,
+                        'length': tree.length
                     }))
 
     def _complexity_filter(self, x):
         """
         Filter regex by its complexity and length
         """
+        stats = self._stage_stats
         return pipe(x,
-                    curried.filter(
-                        lambda x: x['complexity'] > 2 and x['complexity'] < self._max_complexity),
-                    curried.filter(lambda x: x['length'] >=
-                                   1 and x['length'] < self._max_length),
+                    curried.filter(stats.filter(
+                        'complexity_filter.complexity',
+                        lambda x: x['complexity'] > 2 and x['complexity'] < self._max_complexity)),
+                    curried.filter(stats.filter(
+                        'complexity_filter.length',
+                        lambda x: x['length'] >= 1 and x['length'] < self._max_length)),
                     )
 
     def _validity_filter(self, x):
         """
         Filter the regex by the validity of generated examples
+
+        NOTE: the regex is rendered and compiled once, and carried
+        by the result as `regex` and `compiled`
         """
+        stats = self._stage_stats
         return pipe(x,
-                    curried.filter(lambda x: self._can_fullmatch(x['regex'])),
-                    curried.map(self._add_examples),
-                    curried.filter(lambda x: isinstance(x['examples'], list)),
-                    curried.filter(lambda x: len(x['examples']) == x['complexity']),
-                    curried.filter(self._all_examples_fullmatch),
+                    curried.map(stats.map(
+                        'validity_filter.add_compiled', self._add_compiled)),
+                    curried.filter(stats.filter(
+                        'validity_filter.can_fullmatch', self._can_fullmatch)),
+                    curried.map(stats.map(
+                        'validity_filter.add_examples', self._add_examples)),
+                    curried.filter(stats.filter(
+                        'validity_filter.examples_valid', lambda x: x['examples'] is not None)),
                     )
 
     def _regex_producer(self):
         """
         Generate random regex from the pattern generator
+
+        NOTE: with targeted sampling, patterns out of the range of
+        `_complexity_filter` are cut off while they are built.
         """
         while True:
-            yield self._pattern_generator.get_random_pattern()
+            self._candidates += 1
+            if self._targeted_sampling:
+                yield self._pattern_generator.get_random_tree_in_window(
+                    (3, self._max_complexity), (1, self._max_length))
+            else:
+                yield self._pattern_generator.get_random_tree()
 
-    def _can_fullmatch(self, regex_str: str) -> bool:
+    def _add_compiled(self, result: dict) -> dict:
+        """
+        Add the rendered and the compiled regex
+        """
+        result['regex'] = result['tree'].regex
+        result['compiled'] = self._compile_cache.compile(result['regex'])
+        return result
+
+    def _can_fullmatch(self, result: dict) -> bool:
         """
         Assert fullmatching is possible
         """
-        example = exrex.getone(regex_str)
-        return bool(re.compile(regex_str).fullmatch(example))
+        example = self._get_one_example(result)
+        return bool(result['compiled'].fullmatch(example))
 
     def _add_example(self, result: dict) -> dict:
         """
         Add one single example
+
+        NOTE: a native example is drawn uniformly from all the examples.
+        If it does not fullmatch, the regex is invalid and the example is None.
         """
-        result['example'] = exrex.getone(result['regex'])
-        while not bool(re.compile(
-                result['regex']).fullmatch(result['example'])):
+        com = result['compiled']
+        result['example'] = self._get_one_example(result)
+        if self._native_examples:
+            if not bool(com.fullmatch(result['example'])):
+                result['example'] = None
+            return result
+        while not bool(com.fullmatch(result['example'])):
             result['example'] = exrex.getone(result['regex'])
         return result
 
-    def _add_examples(self, result):
+    def _get_one_example(self, result: dict) -> str:
+        """
+        Draw one random example
+        """
+        if self._native_examples:
+            return result['tree'].sample_examples(1)[0]
+        return exrex.getone(result['regex'])
+
+    def _add_examples(self, result: dict) -> dict:
         """
         Generating of multiple examples
+
+        The examples are enumerated as a stream and each of them is
+        checked against the compiled regex as it is produced. The enumeration
+        stops at the first invalid example, which rejects the regex
+        (`examples` is None and `reject_reason` tells why), or once
+        `max_examples` examples are collected.
+
+        The examples are enumerated from the pattern tree (reusing the
+        examples of sub-patterns from the example cache if it is enabled),
+        or by exrex from the regex string if `native_examples` is disabled.
+        With `example_samples`, only that many examples are sampled uniformly
+        from the pattern tree, so the cost does not grow with the complexity.
+
+        NOTE: regex with empty groups, e.g., `()`, are rejected up front, as
+        exrex fails to enumerate them, and their examples are mostly repeats
+        of the empty string, e.g., `((()){2,6})`.
         """
-        regex = result['regex']
+        com = result['compiled']
+        if has_empty_group(result['tree']):
+            return self._reject(result, REJECT_EMPTY_GROUP)
+        if self._example_samples is not None:
+            return self._add_sampled_examples(result)
+        if self._native_examples:
+            enumeration = result['tree'].examples(cache=self._example_cache)
+        else:
+            enumeration = exrex.generate(result['regex'])
+        examples = []
         try:
-            examples = []
-            for example in exrex.generate(regex):
+            for example in itertools.islice(enumeration, self._max_examples):
+                if not isinstance(example, str):
+                    return self._reject(result, REJECT_NON_STRING_EXAMPLE)
+                if com.fullmatch(example) is None:
+                    return self._reject(result, REJECT_MISMATCH)
                 examples.append(example)
-            result['examples'] = examples
-            return result
-        except TypeError as e:
-            if e.args[0] == 'can only concatenate list (not "str") to list':
-                result['examples'] = None
-                return result
-            elif e.args[0] == 'can only concatenate str (not "list") to str':
-                result['examples'] = None
-                return result
-            else:
-                raise e
+                if len(examples) > result['complexity']:
+                    return self._reject(result, REJECT_COUNT_MISMATCH)
+        except TypeError:
+            # exrex fails to concatenate the examples of some nested patterns
+            # (e.g., 'can only concatenate list (not "str") to list')
+            return self._reject(result, REJECT_ENUMERATION_ERROR)
+        if len(examples) < result['complexity'] and len(examples) != self._max_examples:
+            return self._reject(result, REJECT_COUNT_MISMATCH)
+        result['examples'] = examples
+        return result
 
-    def _all_examples_fullmatch(self, result: dict) -> bool:
+    def _add_sampled_examples(self, result: dict) -> dict:
         """
-        Check whether all examples fullmatch the regex
+        Add examples sampled uniformly from the pattern tree
         """
-        com = re.compile(result['regex'])
-        answers = []
-        for example in result['examples']:
-            try:
-                ans = bool(com.fullmatch(example))
-            except TypeError as e:
-                if e.args[0] == 'expected string or bytes-like object':
-                    return False
-                else:
-                    raise e
-            answers.append(ans)
-        return all(answers)
+        com = result['compiled']
+        examples = result['tree'].sample_examples(self._example_samples)
+        for example in examples:
+            if com.fullmatch(example) is None:
+                return self._reject(result, REJECT_MISMATCH)
+        result['examples'] = examples
+        return result
+
+    def _reject(self, result: dict, reason: str) -> dict:
+        """
+        Mark the result as rejected during example enumeration
+        """
+        self._rejections[reason] += 1
+        result['examples'] = None
+        result['reject_reason'] = reason
+        return result
+
+    def _add_canonical(self, result: dict) -> dict:
+        """
+        Add the canonical form of the regex
+        """
+        result['canonical'] = canonicalize(result['tree'])
+        return result
 
-    def _filter_repeat(self, iterable):
+    def _filter_repeat(self, iterable, stage: str = 'filter_repeat', key: str = 'regex', add: bool = True):
         """
-        Filter out the repeated regex pattern
+        Filter out the repeated regex pattern, compared by `result[key]`,
+        and remember the others unless `add` is False (see `_add_repeat_key`)
         """
         for x in iterable:
-            if x['regex'] not in self._bloom:
+            start = time.perf_counter()
+            repeated = x[key] in self._bloom
+            if not repeated and add:
+                self._bloom.add(x[key])
+            self._stage_stats.record(
+                stage, 1, int(not repeated), time.perf_counter() - start)
+            if not repeated:
+                yield x
+
+    def _add_repeat_key(self, result: dict, key: str) -> dict:
+        """
+        Remember the result for `_filter_repeat`
+        """
+        self._bloom.add(result[key])
+        return result
+
+    def _dump_stats(self, iterable):
+        """
+        Periodically dump the stage counters as JSON
+        """
+        if self._stats_path is None:
+            yield from iterable
+            return
+        last_dump = time.monotonic()
+        try:
+            for x in iterable:
                 yield x
-                self._bloom.add(x['regex'])
+                if time.monotonic() - last_dump >= self._stats_interval:
+                    self._stage_stats.dump(self._stats_path, accepted_stage=self._accepted_stage)
+                    last_dump = time.monotonic()
+        finally:
+            self._stage_stats.dump(self._stats_path, accepted_stage=self._accepted_stage)
+
+
+class _ShardResult(dict):
+    """
+    Result merged from a worker process, whose regex is compiled
+    (by `compile_func`) only once `compiled` is asked for
+    """
+    __slots__ = ('_compile_func',)
+
+    def __init__(self, fields: dict, compile_func: typing.Callable[[str], typing.Pattern]):
+        super().__init__(fields)
+        self._compile_func = compile_func
+
+    def __missing__(self, key):
+        if key != 'compiled':
+            raise KeyError(key)
+        self['compiled'] = self._compile_func(self['regex'])
+        return self['compiled']
+
+
+def _generate_shard(results, shard: int, generator_class, generator_kwargs: dict,
+                    batch_size: int):
+    """
+    Worker process of `RegexGenerator.generate(workers=N)`:
+    put batches of the corpus fields of the generated results
+    (including the key of the repeat filter) into the shared queue,
+    along with the stage counters of the worker
+
+    NOTE: the pattern trees and the compiled regex are left out,
+    as unpickling them would make the merging process the bottleneck.
+    """
+    generator = generator_class(**generator_kwargs)
+    for batch in partition_all(batch_size, generator.generate()):
+        results.put((shard, [{key: x[key] for key in FIELDS if key in x} for x in batch],
+                     generator._stage_stats.counters))
+
+
+def _feed_shard(ring: SharedBatchRing, shard: int, generator_class, generator_kwargs: dict):
+    """
+    Worker process of `RegexGenerator.feed(workers=N)`:
+    pack the generated results into the shared batches of the ring
+    and stage them, along with the stage counters of the worker
+    """
+    generator = generator_class(**generator_kwargs)
+    for slot in ring.pack(generator.generate(), shard):
+        ring.stage(slot, shard, generator._stage_stats.counters)
@@ -0,0 +1,413 @@
+"""
+Zero-copy feed of generated regex to consumer processes
+
+Generated results are packed into fixed-size batches in a shared memory
+block, split into a ring of slots. A slot holds the complexity and the
+length of its records, and their strings (regex, canonical form,
+other fields and examples) as UTF-8 bytes in a single buffer, delimited
+by offset arrays:
+
+- string j of the slot is `data[text_offsets[j]:text_offsets[j + 1]]`
+- the strings of record i are those from `record_starts[i]` to
+    `record_starts[i + 1]`: its regex, its canonical form (empty if
+    the generator runs without `canonical_dedupe`), the other fields of
+    `CorpusWriter` it has, e.g., `negative_examples` and `match_cost`,
+    as a JSON object (empty if none), then its examples
+
+Only the indices of the slots go through the multiprocessing queues:
+free slots are acquired by the producers, filled, and published to the
+consumers, who read them through numpy views of the shared memory and
+release them once done. Producers block while no slot is free, so a slow
+consumer slows down the generation instead of piling up batches.
+
+Batches of worker processes are staged first, so that the process
+merging them can drop the regex repeated across workers by clearing
+their `keep` flag before publishing them.
+"""
+import os
+import json
+import typing
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy
+from src.corpus_writer import FIELDS
+
+__all__ = ['SharedBatchRing', 'SharedBatch']
+
+# Number of int64 in the header of a slot:
+# records, strings, bytes of data, shard
+_HEADER_SIZE = 4
+# Fields of CorpusWriter packed into the JSON string of a record
+_JSON_FIELDS = tuple(x for x in FIELDS if x not in ('regex', 'canonical', 'complexity', 'length', 'examples'))
+# Strings of a record before its examples: regex, canonical form and JSON fields
+_RECORD_HEADER_STRINGS = 3
+
+
+class SharedBatchRing:
+    """
+    Ring of fixed-size batches in shared memory
+
+    The ring is created by the producing process, and is handed to the
+    worker and the consumer processes as an argument of
+    `multiprocessing.Process`.
+
+    Args:
+        - slots: number of batches in the ring
+        - slot_records: maximum number of records of a batch
+        - slot_strings: maximum number of strings (regex, canonical form,
+            JSON fields and examples) of a batch
+        - slot_bytes: maximum size of the UTF-8 strings of a batch
+    """
+
+    def __init__(self, slots: int = 8, slot_records: int = 256,
+                 slot_strings: int = 64 * 1024, slot_bytes: int = 2 ** 20):
+        assert isinstance(slots, int) and slots > 0, 'slots should be > 0'
+        assert isinstance(slot_records, int) and slot_records > 0, 'slot_records should be > 0'
+        assert isinstance(slot_strings, int) and slot_strings >= _RECORD_HEADER_STRINGS * slot_records, \
+            f'slot_strings should be >= {_RECORD_HEADER_STRINGS} * slot_records'
+        assert isinstance(slot_bytes, int) and slot_bytes > 0, 'slot_bytes should be > 0'
+        self._layout = _get_layout(slot_records, slot_strings, slot_bytes)
+        self._slots = slots
+        self._memory = shared_memory.SharedMemory(create=True, size=slots * self._layout['size'])
+        # Forked processes inherit the ring without unpickling it
+        self._owner_pid = os.getpid()
+        self._free = multiprocessing.Queue()
+        self._staged = multiprocessing.Queue()
+        self._ready = multiprocessing.Queue()
+        for slot in range(slots):
+            self._free.put(slot)
+
+    def __getstate__(self) -> dict:
+        return {
+            'name': self._memory.name,
+            'layout': self._layout,
+            'slots': self._slots,
+            'free': self._free,
+            'staged': self._staged,
+            'ready': self._ready
+        }
+
+    def __setstate__(self, state: dict):
+        self._layout = state['layout']
+        self._slots = state['slots']
+        self._memory = _attach(state['name'])
+        self._owner_pid = None
+        self._free = state['free']
+        self._staged = state['staged']
+        self._ready = state['ready']
+
+    @property
+    def slots(self) -> int:
+        return self._slots
+
+    @property
+    def slot_records(self) -> int:
+        return self._layout['records']
+
+    def pack(self, results: typing.Iterable[dict], shard: int = 0) -> typing.Iterator[int]:
+        """
+        Pack the results into free slots, and yield each slot once it is
+        full (or the results are exhausted) for the caller to publish
+        or stage it. Blocks while no slot is free.
+
+        NOTE: a result larger than a slot raises ValueError
+        """
+        builder = _BatchBuilder(self._layout)
+        for result in results:
+            if builder.add(result):
+                continue
+            if builder.records == 0:
+                raise ValueError('result does not fit in an empty slot, '
+                                 'slot_strings or slot_bytes should be larger')
+            yield self._write(builder, shard)
+            builder = _BatchBuilder(self._layout)
+            if not builder.add(result):
+                raise ValueError('result does not fit in an empty slot, '
+                                 'slot_strings or slot_bytes should be larger')
+        if builder.records > 0:
+            yield self._write(builder, shard)
+
+    def publish(self, slot: int):
+        """
+        Hand a packed slot to the consumers
+        """
+        self._ready.put(slot)
+
+    def stage(self, slot: int, shard: int, counters: dict):
+        """
+        Hand a packed slot of a worker process to the merging process,
+        along with the stage counters of the worker
+        """
+        self._staged.put((shard, slot, counters))
+
+    def get_staged(self, timeout: typing.Optional[float] = None) -> typing.Tuple[int, 'SharedBatch', dict]:
+        """
+        Take a staged batch: shard, batch and stage counters of the worker
+
+        NOTE: raises queue.Empty after `timeout` seconds
+        """
+        shard, slot, counters = self._staged.get(timeout=timeout)
+        return shard, SharedBatch(self, slot), counters
+
+    def get(self, timeout: typing.Optional[float] = None) -> typing.Optional['SharedBatch']:
+        """
+        Take a published batch, or None once the producer is finished
+
+        NOTE: raises queue.Empty after `timeout` seconds
+        """
+        slot = self._ready.get(timeout=timeout)
+        if slot is None:
+            # Leave the end mark to the other consumers
+            self._ready.put(None)
+            return None
+        return SharedBatch(self, slot)
+
+    def __iter__(self) -> typing.Iterator['SharedBatch']:
+        """
+        Published batches until the producer is finished,
+        each released once the next one is asked for
+        """
+        while True:
+            batch = self.get()
+            if batch is None:
+                return
+            with batch:
+                yield batch
+
+    def finish(self):
+        """
+        Mark the end of the batches for the consumers
+        """
+        self._ready.put(None)
+
+    def release(self, slot: int):
+        """
+        Return a slot to the producers
+        """
+        self._free.put(slot)
+
+    def close(self):
+        """
+        Detach from the shared memory, which is freed
+        once the creating process closes the ring
+        """
+        self._memory.close()
+        if self._owner_pid == os.getpid():
+            self._memory.unlink()
+
+    def __enter__(self) -> 'SharedBatchRing':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _write(self, builder: '_BatchBuilder', shard: int) -> int:
+        """
+        Write a full batch into a free slot, waiting for one if needed
+        """
+        slot = self._free.get()
+        builder.write(self._view(slot), shard)
+        return slot
+
+    def _view(self, slot: int) -> '_SlotView':
+        return _SlotView(self._memory.buf, self._layout, slot)
+
+
+class SharedBatch:
+    """
+    Batch of records read in place from a slot of the ring
+
+    The arrays are views of the shared memory, valid until the batch is
+    released (explicitly or by leaving the `with` block), after which the
+    slot is reused by the producers. Records whose `keep` flag is cleared
+    are repeats to be skipped.
+    """
+
+    def __init__(self, ring: SharedBatchRing, slot: int):
+        self._ring = ring
+        self._view = ring._view(slot)
+        self.slot = slot
+        self.shard = int(self._view.header[3])
+        records, strings, size = (int(x) for x in self._view.header[:3])
+        self.complexity = self._view.complexity[:records]
+        self.length = self._view.length[:records]
+        self.record_starts = self._view.record_starts[:records + 1]
+        self.text_offsets = self._view.text_offsets[:strings + 1]
+        self.keep = self._view.keep[:records]
+        self.data = self._view.data[:size]
+
+    def __len__(self) -> int:
+        """
+        Number of records kept
+        """
+        return int(numpy.count_nonzero(self.keep))
+
+    def string(self, index: int) -> str:
+        """
+        Decode a string of the batch
+        """
+        return str(self.data[self.text_offsets[index]:self.text_offsets[index + 1]], 'utf-8')
+
+    def regex(self, record: int) -> str:
+        return self.string(self.record_starts[record])
+
+    def canonical(self, record: int) -> str:
+        return self.string(self.record_starts[record] + 1)
+
+    def fields(self, record: int) -> dict:
+        """
+        Decode the JSON fields of a record, e.g., `negative_examples`
+        """
+        text = self.string(self.record_starts[record] + 2)
+        return json.loads(text) if text else {}
+
+    def examples(self, record: int) -> typing.List[str]:
+        return [self.string(j) for j in range(
+            self.record_starts[record] + _RECORD_HEADER_STRINGS, self.record_starts[record + 1])]
+
+    def records(self) -> typing.Iterator[dict]:
+        """
+        Decode the kept records, with the fields of `CorpusWriter`
+        """
+        data = self.data.tobytes()
+        offsets = self.text_offsets.tolist()
+        starts = self.record_starts.tolist()
+        strings = [data[offsets[j]:offsets[j + 1]].decode() for j in range(len(offsets) - 1)]
+        for i in numpy.flatnonzero(self.keep).tolist():
+            record = {
+                'regex': strings[starts[i]],
+                'canonical': strings[starts[i] + 1],
+                'complexity': int(self.complexity[i]),
+                'length': int(self.length[i]),
+                'examples': strings[starts[i] + _RECORD_HEADER_STRINGS:starts[i + 1]]
+            }
+            if strings[starts[i] + 2]:
+                record.update(json.loads(strings[starts[i] + 2]))
+            yield record
+
+    def release(self):
+        """
+        Drop the views and return the slot to the producers
+        """
+        if self._view is None:
+            return
+        self.complexity = self.length = self.record_starts = None
+        self.text_offsets = self.keep = self.data = None
+        self._view = None
+        self._ring.release(self.slot)
+
+    def __enter__(self) -> 'SharedBatch':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class _SlotView:
+    """
+    Numpy arrays over a slot of the shared memory
+    """
+
+    def __init__(self, buffer, layout: dict, slot: int):
+        self.slot = slot
+        base = slot * layout['size']
+        for name, dtype, count, offset in layout['arrays']:
+            setattr(self, name, numpy.ndarray((count,), dtype=dtype, buffer=buffer, offset=base + offset))
+
+
+class _BatchBuilder:
+    """
+    Records of a batch gathered until it is full,
+    then written into a slot at once
+    """
+
+    def __init__(self, layout: dict):
+        self._max_records = layout['records']
+        self._max_strings = layout['strings']
+        self._max_bytes = layout['bytes']
+        self.records = 0
+        self._complexity = []
+        self._length = []
+        self._record_starts = [0]
+        self._sizes = []
+        self._data = []
+        self._bytes = 0
+
+    def add(self, result: dict) -> bool:
+        """
+        Append a result, or return False if the batch has no room for it
+        """
+        fields = {key: result[key] for key in _JSON_FIELDS if key in result}
+        strings = [result['regex'], result.get('canonical', ''), json.dumps(fields) if fields else '']
+        strings.extend(result['examples'])
+        text = ''.join(strings)
+        data = text.encode()
+        if len(data) == len(text):
+            # ASCII only: the UTF-8 sizes are the numbers of chars
+            sizes = list(map(len, strings))
+        else:
+            sizes = [len(x.encode()) for x in strings]
+        if self.records == self._max_records or \
+                len(self._sizes) + len(sizes) > self._max_strings or \
+                self._bytes + len(data) > self._max_bytes:
+            return False
+        self._data.append(data)
+        self._bytes += len(data)
+        self._sizes.extend(sizes)
+        self._record_starts.append(len(self._sizes))
+        self._complexity.append(result['complexity'])
+        self._length.append(result['length'])
+        self.records += 1
+        return True
+
+    def write(self, view: '_SlotView', shard: int):
+        strings = len(self._sizes)
+        view.header[:] = (self.records, strings, self._bytes, shard)
+        view.complexity[:self.records] = self._complexity
+        view.length[:self.records] = self._length
+        view.record_starts[:self.records + 1] = self._record_starts
+        view.text_offsets[0] = 0
+        numpy.cumsum(self._sizes, out=view.text_offsets[1:strings + 1])
+        view.keep[:self.records] = 1
+        view.data[:self._bytes] = numpy.frombuffer(b''.join(self._data), dtype=numpy.uint8)
+
+
+def _get_layout(records: int, strings: int, size: int) -> dict:
+    """
+    Offsets of the arrays in a slot, int64 arrays first so that
+    they stay aligned, and the size of a slot rounded to 64 bytes
+    """
+    arrays = []
+    offset = 0
+    for name, dtype, count in (
+            ('header', numpy.int64, _HEADER_SIZE),
+            ('complexity', numpy.int64, records),
+            ('length', numpy.int64, records),
+            ('record_starts', numpy.int64, records + 1),
+            ('text_offsets', numpy.int64, strings + 1),
+            ('keep', numpy.uint8, records),
+            ('data', numpy.uint8, size)):
+        arrays.append((name, dtype, count, offset))
+        offset += count * numpy.dtype(dtype).itemsize
+    return {
+        'records': records,
+        'strings': strings,
+        'bytes': size,
+        'arrays': arrays,
+        'size': -(-offset // 64) * 64
+    }
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """
+    Attach to the shared memory of the creating process
+
+    NOTE: before Python 3.13, attaching registers the block again to the
+    resource tracker, which is shared with the creating process when the
+    ring is handed to a child process, so that the block is still freed
+    only once, by `close` in the creating process
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
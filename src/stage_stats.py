@@ -0,0 +1,121 @@
+"""
+Throughput and rejection-rate counters of the generation pipeline
+
+Each stage of `RegexGenerator.generate` keeps the number of items it
+takes in, the number of items it passes on and the cumulative wall
+time spent in it.
+"""
+import os
+import json
+import time
+import typing
+
+__all__ = ['StageStats']
+
+
+class StageStats:
+    """
+    Per-stage counters: [items in, items out, seconds]
+    """
+
+    def __init__(self):
+        self._counters: typing.Dict[str, typing.List] = {}
+        self._shards: typing.Dict[int, typing.Dict[str, typing.List]] = {}
+
+    def record(self, stage: str, items_in: int, items_out: int, seconds: float):
+        counter = self._counters.setdefault(stage, [0, 0, 0.])
+        counter[0] += items_in
+        counter[1] += items_out
+        counter[2] += seconds
+
+    def map(self, stage: str, func: typing.Callable) -> typing.Callable:
+        """
+        Instrument a function applied to each item
+        """
+        def timed(x):
+            start = time.perf_counter()
+            result = func(x)
+            self.record(stage, 1, 1, time.perf_counter() - start)
+            return result
+        return timed
+
+    def filter(self, stage: str, predicate: typing.Callable) -> typing.Callable:
+        """
+        Instrument a predicate applied to each item
+        """
+        def timed(x):
+            start = time.perf_counter()
+            result = predicate(x)
+            self.record(stage, 1, int(bool(result)), time.perf_counter() - start)
+            return result
+        return timed
+
+    def iterate(self, stage: str, iterable: typing.Iterable) -> typing.Iterator:
+        """
+        Instrument a source of items by timing each step of its iteration
+        """
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                x = next(iterator)
+            except StopIteration:
+                return
+            self.record(stage, 1, 1, time.perf_counter() - start)
+            yield x
+
+    def restore(self, counters: typing.Dict[str, typing.List]):
+        """
+        Continue from the counters of a previous run
+        """
+        self._counters = {stage: list(counter) for stage, counter in counters.items()}
+
+    def merge_shard(self, shard: int, counters: typing.Dict[str, typing.List]):
+        """
+        Keep the latest counters reported by a worker process
+        """
+        self._shards[shard] = counters
+
+    @property
+    def counters(self) -> typing.Dict[str, typing.List]:
+        """
+        Counters of this process summed with those of the worker processes
+        """
+        merged = {stage: list(counter) for stage, counter in self._counters.items()}
+        for counters in self._shards.values():
+            for stage, counter in counters.items():
+                total = merged.setdefault(stage, [0, 0, 0.])
+                for i, value in enumerate(counter):
+                    total[i] += value
+        return merged
+
+    def report(self, accepted_stage: typing.Optional[str] = None) -> dict:
+        """
+        Readable statistics of each stage
+
+        Args:
+            - accepted_stage: stage whose output counts the accepted items,
+                for the seconds spent by each stage per accepted item
+        """
+        counters = self.counters
+        accepted = counters[accepted_stage][1] if accepted_stage in counters else 0
+        result = {}
+        for stage, (items_in, items_out, seconds) in counters.items():
+            result[stage] = {
+                'in': items_in,
+                'out': items_out,
+                'seconds': seconds,
+                'rejection_rate': 1. - items_out / items_in if items_in else 0.,
+                'items_per_second': items_in / seconds if seconds else None,
+                'seconds_per_accepted': seconds / accepted if accepted else None
+            }
+        return result
+
+    def dump(self, path: str, accepted_stage: typing.Optional[str] = None):
+        """
+        Atomically write the report as JSON
+        """
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.report(accepted_stage=accepted_stage), f, indent=2)
+        os.replace(tmp_path, path)